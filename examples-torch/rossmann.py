@@ -12,7 +12,6 @@ import pandas as pd
 from multiprocessing import cpu_count
 import numpy as np
 import torch.nn.functional as F
-import isoweek
 import torch.optim as optim
 from tqdm import tqdm
 
@@ -42,32 +41,6 @@ def to_csv(test_file, output_file, identifier_field, predicted_field,
     df.to_csv(output_file, index=False)
 
 
-def get_elapsed(df, monitored_field, prefix='elapsed_'):
-    """
-    Cumulative counting across a sorted dataframe.
-    Given a particular field to monitor, this function will start tracking time since the
-    last occurrence of that field. When the field is seen again, the counter is set to zero.
-    Args:
-        df (pd.DataFrame): A pandas DataFrame
-        monitored_field (str): A string that is the name of the date column you wish to expand.
-            Assumes the column is of type datetime64
-        prefix (str): The prefix to add to the newly created field.
-    """
-    day1 = np.timedelta64(1, 'D')
-    last_date = np.datetime64()
-    last_store = 0
-    res = []
-
-    for s, v, d in zip(df["Store"].values, df[monitored_field].values, df["Date"].values):
-        if s != last_store:
-            last_date = np.datetime64()
-            last_store = s
-        if v:
-            last_date = d
-        res.append(((d - last_date).astype('timedelta64[D]') / day1).astype(int))
-    df[prefix + monitored_field] = res
-
-
 def prepare_data(files_path, preprocessed_train_path, preprocessed_test_path):
     print("Preparing data...")
     with tqdm(total=16) as pbar:
@@ -105,15 +78,16 @@ def prepare_data(files_path, preprocessed_train_path, preprocessed_test_path):
         pbar.update(1)
 
         # Outer join to a single dataframe
-        store = tmerger.join_df(store, store_states, "Store")
-        joined = tmerger.join_df(train, store, "Store")
-        joined_test = tmerger.join_df(test, store, "Store")
-        joined = tmerger.join_df(joined, googletrend, ["State", "Year", "Week"])
-        joined_test = tmerger.join_df(joined_test, googletrend, ["State", "Year", "Week"])
-        joined = joined.merge(trend_de, 'left', ["Year", "Week"], suffixes=('', '_DE'))
-        joined_test = joined_test.merge(trend_de, 'left', ["Year", "Week"], suffixes=('', '_DE'))
-        joined = tmerger.join_df(joined, weather, ["State", "Date"])
-        joined_test = tmerger.join_df(joined_test, weather, ["State", "Date"])
+        store = tmerger.lookup_join(store, store_states, "Store")
+        joined, joined_test = tmerger.join_mult_df([train, test], [store], ["Store"], suffixes=['_y'])
+        # The trends are weekly (from Sunday to Saturday): match each day with the week started at most 6 days before
+        week = pd.Timedelta(days=6)
+        joined, joined_test = [tmerger.join_asof(df, googletrend, "Date", by="State", tolerance=week)
+                               for df in (joined, joined_test)]
+        joined, joined_test = [tmerger.join_asof(df, trend_de, "Date", tolerance=week, suffix="_DE")
+                               for df in (joined, joined_test)]
+        joined, joined_test = tmerger.join_mult_df([joined, joined_test], [weather], [["State", "Date"]],
+                                                   suffixes=['_y'])
         for df in (joined, joined_test):
             for c in df.columns:
                 if c.endswith('_y'):
@@ -132,7 +106,7 @@ def prepare_data(files_path, preprocessed_train_path, preprocessed_test_path):
             # Extract features "CompetitionOpenSince" and "CompetitionDaysOpen"
             df["CompetitionOpenSince"] = pd.to_datetime(dict(year=df.CompetitionOpenSinceYear,
                                                              month=df.CompetitionOpenSinceMonth, day=15))
-            df["CompetitionDaysOpen"] = df.Date.subtract(df.CompetitionOpenSince).dt.days
+            df["CompetitionDaysOpen"] = edate.days_between(df.CompetitionOpenSince, df.Date)
             pbar.update(1)
 
             # Replace some erroneous / outlying data
@@ -143,9 +117,8 @@ def prepare_data(files_path, preprocessed_train_path, preprocessed_test_path):
             # Add "CompetitionMonthsOpen" field, limiting the maximum to 2 years to limit number of unique categories.
             df["CompetitionMonthsOpen"] = df["CompetitionDaysOpen"] // 30
             df.loc[df.CompetitionMonthsOpen > 24, "CompetitionMonthsOpen"] = 24
-            df["Promo2Since"] = pd.to_datetime(df.apply(lambda x: isoweek.Week(
-                x.Promo2SinceYear, x.Promo2SinceWeek).monday(), axis=1).astype(pd.datetime))
-            df["Promo2Days"] = df.Date.subtract(df["Promo2Since"]).dt.days
+            df["Promo2Since"] = edate.iso_week_to_date(df.Promo2SinceYear, df.Promo2SinceWeek)
+            df["Promo2Days"] = edate.days_between(df["Promo2Since"], df.Date)
             df.loc[df.Promo2Days < 0, "Promo2Days"] = 0
             df.loc[df.Promo2SinceYear < 1990, "Promo2Days"] = 0
             df["Promo2Weeks"] = df["Promo2Days"] // 7
@@ -156,40 +129,24 @@ def prepare_data(files_path, preprocessed_train_path, preprocessed_test_path):
         # Durations
         columns = ["Date", "Store", "Promo", "StateHoliday", "SchoolHoliday"]
         for name, df in zip(("train", "test"), (train[columns], test[columns])):
-            field = 'SchoolHoliday'
-            df = df.sort_values(['Store', 'Date'])
-            get_elapsed(df, field, 'After')
-            field = 'StateHoliday'
-            df = df.sort_values(['Store', 'Date'])
-            get_elapsed(df, field, 'After')
-            field = 'Promo'
-            df = df.sort_values(['Store', 'Date'])
-            get_elapsed(df, field, 'After')
-            # Set the active index to Date
-            df = df.set_index("Date")
+            # Days since the last holiday/promo of each store
+            df = edate.get_event_elapsed(df, ['SchoolHoliday', 'StateHoliday', 'Promo'], 'Date', by='Store',
+                                         since_prefix='After', until_prefix=None)
             # Set null values from elapsed field calculations to 0
             columns = ['SchoolHoliday', 'StateHoliday', 'Promo']
             for p in columns:
                 a = 'After' + p
                 df[a] = df[a].fillna(0)
-            # Window functions in pandas to calculate rolling quantities
-            bwd = df[['Store'] + columns].sort_index().groupby("Store").rolling(7, min_periods=1).sum()
-            fwd = df[['Store'] + columns].sort_index(ascending=False).groupby("Store").rolling(7, min_periods=1).sum()
-            # We want to drop the Store indices grouped together in the window function
-            bwd.drop('Store', 1, inplace=True)
-            bwd.reset_index(inplace=True)
-            fwd.drop('Store', 1, inplace=True)
-            fwd.reset_index(inplace=True)
-            df.reset_index(inplace=True)
-            df = df.merge(bwd, 'left', ['Date', 'Store'], suffixes=['', '_bw'])
-            df = df.merge(fwd, 'left', ['Date', 'Store'], suffixes=['', '_fw'])
-            df.drop(columns, 1, inplace=True)
-            df["Date"] = pd.to_datetime(df.Date)
+            # Rolling quantities over the 7 previous/next days of each store
+            windows = [(c, 7, 'sum', direction) for direction in ('backward', 'forward') for c in columns]
+            rolling = edate.get_window_features([df], windows=windows, by='Store', sort_by='Date')[0]
+            rolling.columns = [c + suffix for suffix in ('_bw', '_fw') for c in columns]
+            df = pd.concat([df.drop(columns, axis=1), rolling], axis=1)
 
             if name == "train":
-                joined = tmerger.join_df(joined, df, ['Store', 'Date'])
+                joined = tmerger.lookup_join(joined, df, ['Store', 'Date'])
             elif name == "test":
-                joined_test = tmerger.join_df(joined_test, df, ['Store', 'Date'])
+                joined_test = tmerger.lookup_join(joined_test, df, ['Store', 'Date'])
             pbar.update(1)
 
         # The authors also removed all instances where the store had zero sale / was closed
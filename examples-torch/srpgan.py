@@ -13,7 +13,8 @@ import torchlite.data.files as efiles
 import torchlite.torch.tools.image_tools as image_tools
 from torchlite.torch.models.srpgan import Generator, Discriminator, weights_init
 from torchlite.torch.train_callbacks import ModelSaverCallback, ReduceLROnPlateau, TensorboardVisualizerCallback
-from torchlite.data.datasets.srpgan import TrainDataset
+from torchlite.data.datasets.srpgan import TrainDataset, multi_crop_collate
+from torchlite.data.datasets.samplers import MultiCropBatchSampler
 from torchlite.torch.learner import Learner
 from torchlite.torch.learner.cores import ClassifierCore, SRPGanCore
 from torchlite.torch.losses.srpgan import GeneratorLoss, DiscriminatorLoss
@@ -39,13 +40,19 @@ def get_loaders(args, num_workers):
     val_hr_path = ds_path / "DIV2K_valid_HR"
 
     train_ds = TrainDataset(efiles.get_files(train_hr_path.absolute()), crop_size=args.crop_size,
-                            upscale_factor=args.upscale_factor, random_augmentations=True)
+                            upscale_factor=args.upscale_factor, random_augmentations=True,
+                            crops_per_image=args.crops_per_image)
 
     # Use the DIV2K dataset for validation as default
     val_ds = TrainDataset(efiles.get_files(val_hr_path.absolute()), crop_size=args.crop_size,
                           upscale_factor=args.upscale_factor, random_augmentations=False)
 
-    train_dl = DataLoader(train_ds, args.batch_size, shuffle=True, num_workers=num_workers)
+    if args.crops_per_image > 1:
+        batch_sampler = MultiCropBatchSampler(len(train_ds), args.batch_size, args.crops_per_image)
+        train_dl = DataLoader(train_ds, batch_sampler=batch_sampler, collate_fn=multi_crop_collate,
+                              num_workers=num_workers)
+    else:
+        train_dl = DataLoader(train_ds, args.batch_size, shuffle=True, num_workers=num_workers)
     val_dl = DataLoader(val_ds, args.batch_size, shuffle=False, num_workers=num_workers)
 
     return train_dl, val_dl
@@ -131,6 +138,8 @@ def main():
                                    "1: Restore the models from the 'checkpoints' folder")
     # Models with different upscale factors and crop sizes are not compatible together
     train_parser.add_argument('--crop_size', default=384, type=int, help='training images crop size')
+    train_parser.add_argument('--crops_per_image', default=1, type=int,
+                              help='Number of random crops taken from each decoded training image')
     train_parser.add_argument('--upscale_factor', default=4, type=int, choices=[2, 4, 8],
                               help="Super Resolution upscale factor. "
                                    "/!\ Models trained on different scale factors won't be compatible with each other")
@@ -32,10 +32,10 @@ setup(
 
     keywords='development',
     packages=find_packages(exclude=['tests']),
-    install_requires=["isoweek", "tqdm", "bcolz", "kaggle_data", "opencv_python", "torch", "torchvision",
-                      "tensorflow-gpu", "scikit_image", "setuptools", "numpy", "matplotlib", "scipy", "Pillow",
-                      "scikit_learn", "tensorboardX", "typing", "PyYAML", "Augmentor", "feather-format",
-                      "fuzzywuzzy", "python-Levenshtein", "category_encoders",
+    install_requires=["isoweek", "tqdm", "bcolz", "kaggle_data", "opencv_python", "torch>=1.10.0", "torchvision",
+                      "tensorflow-gpu", "scikit_image", "setuptools", "numpy", "pandas>=1.5", "matplotlib", "scipy",
+                      "Pillow", "scikit_learn", "tensorboardX", "typing", "PyYAML", "Augmentor", "feather-format",
+                      "pyarrow>=1.0", "fuzzywuzzy", "python-Levenshtein", "category_encoders",
                       find_packages(exclude=["*.tests", "*.tests.*", "tests.*",
                                              "tests", "torchlite.*", "torchvision.*"])],
 )
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import pytest
+
+from torchlite.data.datasets import ColumnarDataset, MmapColumnarDataset
+
+
+def _get_df():
+    return pd.DataFrame({"cat": np.array([0, 3, 1, 2], dtype=np.int64), "cont": [0.5, 1.5, 2.5, 3.5]})
+
+
+def _assert_same_samples(ds, expected):
+    assert len(ds) == len(expected)
+    for actual, expected_values in zip(ds[np.arange(len(ds))], expected[np.arange(len(expected))]):
+        np.testing.assert_array_equal(actual, expected_values)
+
+
+def test_mmap_from_data_frames(tmpdir):
+    df, y = _get_df(), np.array([1., 0., 1., 0.], dtype=np.float32)
+    ds = MmapColumnarDataset.from_data_frames(df[["cat"]], df[["cont"]], y, to_dir=str(tmpdir))
+    assert ds.cats.dtype == np.int8
+    _assert_same_samples(ds, ColumnarDataset.from_data_frames(df[["cat"]], df[["cont"]], y))
+
+
+def test_mmap_from_data_frame_y_positional(tmpdir):
+    df, y = _get_df(), np.array([1., 0., 1., 0.], dtype=np.float32)
+    ds = MmapColumnarDataset.from_data_frame(df, ["cat"], y, to_dir=str(tmpdir))
+    _assert_same_samples(ds, ColumnarDataset.from_data_frame(df, ["cat"], y))
+
+
+def test_mmap_requires_to_dir():
+    df = _get_df()
+    with pytest.raises(TypeError):
+        MmapColumnarDataset.from_data_frame(df, ["cat"], "some_dir")
+
+
+def test_mmap_from_feather(tmpdir):
+    df = _get_df()
+    df["y"] = np.array([1., 0., 1., 0.], dtype=np.float32)
+    path = str(tmpdir.join("data.feather"))
+    feather.write_feather(df, path)
+    ds = MmapColumnarDataset.from_feather(path, ["cat"], "y", to_dir=str(tmpdir.join("mmap")))
+    _assert_same_samples(ds, ColumnarDataset.from_data_frame(df.drop("y", axis=1), ["cat"], df["y"].values))
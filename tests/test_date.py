@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from torchlite.pandas.date import add_lag, get_window_features
+
+
+def test_add_lag_keeps_non_numeric_dtypes():
+    train = pd.DataFrame({"store": [1, 1, 2, 2],
+                          "state": ["a", "b", "c", "d"],
+                          "kind": pd.Categorical(["x", "y", "x", "y"]),
+                          "date": pd.date_range("2020-01-01", periods=4)})
+    test = pd.DataFrame({"store": [1, 2], "state": ["e", "f"], "kind": pd.Categorical(["y", "x"]),
+                         "date": pd.date_range("2020-01-05", periods=2)}, index=[4, 5])
+    for column in ["state", "kind", "date"]:
+        lagged = add_lag([train, test], column, by="store")
+        name = column + "_BY[store]_lag_1"
+        expected = pd.concat([train, test]).groupby("store")[column].shift(1)
+        pd.testing.assert_series_equal(pd.concat([df[name] for df in lagged]), expected, check_names=False)
+    lagged = add_lag([train, test], "state", by="store")
+    assert list(lagged[1]["state_BY[store]_lag_1"]) == ["b", "d"]
+
+
+def test_missing_group_keys_are_not_grouped_together():
+    df = pd.DataFrame({"store": [1., np.nan, 1., np.nan], "sales": [1., 2., 3., 4.]})
+    lagged = add_lag([df], "sales", by="store")[0]["sales_BY[store]_lag_1"]
+    np.testing.assert_array_equal(lagged.values, [np.nan, np.nan, 1., np.nan])
+    windows = get_window_features([df], windows=[("sales", 2, "sum", "backward")], by="store")[0]
+    np.testing.assert_array_equal(windows.iloc[:, 0].values, [1., np.nan, 4., np.nan])
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from torchlite.pandas.merger import join_df, join_mult_df, lookup_join
+
+
+def _get_left():
+    return pd.DataFrame({"store": [1, 2, 3, 1], "sales": [10., 20., 30., 40.]})
+
+
+def test_join_mult_df_has_no_default_suffix():
+    left = _get_left()
+    stores = pd.DataFrame({"store": [1, 2, 3], "state": ["a", "b", "c"]})
+    res = join_mult_df([left], [stores], ["store"])[0]
+    pd.testing.assert_frame_equal(res, join_df(left, stores, "store"))
+    with pytest.raises(ValueError):
+        join_mult_df([left], [stores.assign(sales=[1., 2., 3.])], ["store"])
+    res = join_mult_df([left], [stores.assign(sales=[1., 2., 3.])], ["store"], suffixes=["_y"])[0]
+    assert list(res.columns) == ["store", "sales", "state", "sales_y"]
+
+
+def test_join_mult_df_merges_duplicated_right_keys():
+    left = _get_left()
+    # The duplicated keys don't match any left row so the row count doesn't change
+    promos = pd.DataFrame({"store": [1, 2, 5, 5], "promo": [1, 0, 1, 0]})
+    res = join_mult_df([left], [promos], ["store"])[0]
+    pd.testing.assert_frame_equal(res, join_df(left, promos, "store"))
+    # As before a right table duplicating the rows of the left one is rejected
+    with pytest.raises(AssertionError):
+        join_mult_df([left], [pd.DataFrame({"store": [1, 1], "promo": [1, 0]})], ["store"])
+
+
+def test_lookup_join_rejects_duplicated_right_keys():
+    left = _get_left()
+    with pytest.raises(Exception, match="not unique"):
+        lookup_join(left, pd.DataFrame({"store": [1, 1], "promo": [1, 0]}), "store")
+    res = lookup_join(left, pd.DataFrame({"store": [1, 3], "promo": [1, 0]}), "store")
+    np.testing.assert_array_equal(res["promo"].values, [1., np.nan, 0., 1.])
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from torchlite.pandas.tabular_encoder import TreeEncoder, LinearEncoder
+
+
+def _get_df():
+    return pd.DataFrame({"categ": ["a", "b", None, "a", "c", "b"],
+                         "num": [1., np.nan, 3., 4., 5., 6.],
+                         "target": [0., 1., 1., 0., 1., 0.]})
+
+
+def test_fit_does_not_keep_stats():
+    df = _get_df()
+    for encoder in [TreeEncoder(["num"], ["categ"]), LinearEncoder(["num"], ["categ"], True)]:
+        encoder.fit(df, "target")
+        assert encoder.stats is None
+
+
+def test_fit_keep_stats_then_partial_fit():
+    df = _get_df()
+    encoder = TreeEncoder(["num"], ["categ"], keep_stats=True).fit(df.iloc[:4], "target")
+    assert encoder.stats is not None
+    encoder.partial_fit(df.iloc[4:], "target")
+    expected = TreeEncoder(["num"], ["categ"]).fit(df, "target")
+    pd.testing.assert_frame_equal(encoder.transform(df, verbose=False), expected.transform(df, verbose=False))
+
+
+def test_fit_partitions_rejects_empty_paths():
+    with pytest.raises(ValueError):
+        TreeEncoder(["num"], ["categ"]).fit_partitions([], "target", n_jobs=1)
+
+
+def test_fit_partitions_skips_empty_files(tmpdir):
+    df = _get_df()
+    paths = [str(tmpdir.join("part_0.csv")), str(tmpdir.join("empty.csv")), str(tmpdir.join("part_1.csv"))]
+    df.iloc[:3].to_csv(paths[0], index=False)
+    df.iloc[:0].to_csv(paths[1], index=False)
+    df.iloc[3:].to_csv(paths[2], index=False)
+    encoder = TreeEncoder(["num"], ["categ"]).fit_partitions(paths, "target", n_jobs=1)
+    expected = TreeEncoder(["num"], ["categ"]).fit(df, "target")
+    pd.testing.assert_frame_equal(encoder.transform(df, verbose=False), expected.transform(df, verbose=False))
+    with pytest.raises(ValueError):
+        TreeEncoder(["num"], ["categ"]).fit_partitions([paths[1]], "target", n_jobs=1)
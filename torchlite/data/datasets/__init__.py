@@ -1,8 +1,16 @@
 import torch
 from PIL import Image
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, IterableDataset, get_worker_info
 import numpy as np
+import pandas as pd
 import os
+import pickle
+import shutil
+import tempfile
+import weakref
+import pyarrow as pa
+import pyarrow.feather as feather
+import scipy.sparse as sparse
 
 
 class ImageDataset(Dataset):
@@ -83,3 +91,441 @@ class ColumnarDataset(Dataset):
     @classmethod
     def from_data_frame(cls, df, cat_flds, y=None):
         return cls.from_data_frames(df[cat_flds], df.drop(cat_flds, axis=1), y)
+
+
+def to_sparse_csr_tensor(matrix):
+    """
+    Turn a scipy sparse matrix into a torch.sparse_csr tensor of float32 values
+    Args:
+        matrix (scipy.sparse.spmatrix): The matrix
+
+    Returns:
+        Tensor: The torch.sparse_csr tensor
+    """
+    matrix = sparse.csr_matrix(matrix)
+    return torch.sparse_csr_tensor(torch.from_numpy(matrix.indptr.astype(np.int64)),
+                                   torch.from_numpy(matrix.indices.astype(np.int64)),
+                                   torch.from_numpy(matrix.data.astype(np.float32)),
+                                   size=matrix.shape)
+
+
+def sparse_collate(batch):
+    """
+    Collate the samples of a SparseDataset into a [torch.sparse_csr inputs, dense targets] batch.
+    To use with DataLoader(sparse_dataset, batch_size, collate_fn=sparse_collate) when worker processes
+    are needed, otherwise SparseLoader slices whole batches at once and is faster.
+    Args:
+        batch (list): A list of [csr row, target] samples
+
+    Returns:
+        list: The inputs of shape [batch_size, n_features] and the targets of shape [batch_size, 1]
+    """
+    rows = sparse.vstack([row for row, _ in batch], format="csr")
+    return [to_sparse_csr_tensor(rows), torch.from_numpy(np.concatenate([y for _, y in batch]))]
+
+
+class SparseDataset(Dataset):
+    def __init__(self, X, y=None):
+        """
+        A dataset over a scipy sparse matrix, typically the output of SparseOneHotEncoder or
+        LinearEncoder.transform_sparse(). The rows stay sparse until they are turned
+        into torch.sparse_csr batches by a SparseLoader (or sparse_collate()).
+        __getitem__ accepts an array of indices to slice a whole batch at once.
+        Args:
+            X (scipy.sparse.spmatrix): A matrix of shape [n_samples, n_features]
+            y (np.ndarray, None): The targets or None for the test set (filled with 0)
+        """
+        self.X = sparse.csr_matrix(X)
+        # Fill y with 0 for the test dataset, they will be ignored during the prediction phase
+        y = np.zeros(self.X.shape[0]) if y is None else np.asarray(y)
+        self.y = y.astype(np.float32).reshape(len(y), -1)
+
+    @property
+    def n_features(self):
+        return self.X.shape[1]
+
+    def __len__(self):
+        return self.X.shape[0]
+
+    def __getitem__(self, idx):
+        # Slicing keeps a 2D matrix so the rows can be stacked
+        idx = slice(idx, idx + 1) if np.isscalar(idx) else idx
+        return [self.X[idx], self.y[idx]]
+
+
+def _get_int_dtype(min_value, max_value):
+    """
+    Returns the narrowest signed int dtype which can hold values between min_value and max_value
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= min_value and max_value <= info.max:
+            return dtype
+    return np.int64
+
+
+class MmapColumnarDataset(ColumnarDataset):
+    def __init__(self, from_dir):
+        """
+        A ColumnarDataset backed by .npy files memory mapped from disk so it can
+        hold more rows than the RAM.
+        The categorical variables are stored in the narrowest int type which fits their codes,
+        the continuous variables and the target as float32. The categorical variables
+        are turned to int64 only for the requested rows.
+        Use from_data_frame() or from_feather() to write the files.
+        Args:
+            from_dir (str): The directory containing the cats.npy, conts.npy and y.npy files
+        """
+        self.from_dir = from_dir
+        self.cats = np.load(os.path.join(from_dir, "cats.npy"), mmap_mode="r")
+        self.conts = np.load(os.path.join(from_dir, "conts.npy"), mmap_mode="r")
+        self.y = np.load(os.path.join(from_dir, "y.npy"), mmap_mode="r")
+
+    def __getitem__(self, idx):
+        # Copies the requested rows out of the read-only memory maps
+        return [self.cats[idx].astype(np.int64), np.array(self.conts[idx]), np.array(self.y[idx])]
+
+    @staticmethod
+    def _write_array(path, columns, n, n_columns, dtype):
+        """
+        Write the columns one by one in a (n, n_columns) memory mapped array.
+        Args:
+            path (str): The .npy file path
+            columns (iterable): An iterable of n_columns column values, consumed one column at a time
+            n (int): The number of rows
+            n_columns (int): The number of columns
+            dtype (np.dtype): The dtype of the array
+        """
+        arr = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(n, max(1, n_columns)))
+        if n_columns == 0:
+            arr[:] = 0
+        for i, values in enumerate(columns):
+            arr[:, i] = values
+        arr.flush()
+        del arr
+
+    @classmethod
+    def _write(cls, to_dir, n, cat_columns, cont_columns, y_column):
+        """
+        Args:
+            to_dir (str): The directory where the files are written
+            n (int): The number of rows
+            cat_columns (list): The categorical codes as a list of arrays (memory mapped or views)
+            cont_columns (list): A list of callables returning the continuous columns values
+            y_column (callable, None): A callable returning the target or None
+        """
+        os.makedirs(to_dir, exist_ok=True)
+        min_value, max_value = 0, 0
+        for col in cat_columns:
+            if len(col) > 0:
+                min_value, max_value = min(min_value, col.min()), max(max_value, col.max())
+        cats_dtype = _get_int_dtype(min_value, max_value)
+
+        cls._write_array(os.path.join(to_dir, "cats.npy"), cat_columns, n, len(cat_columns), cats_dtype)
+        cls._write_array(os.path.join(to_dir, "conts.npy"), (get_column() for get_column in cont_columns), n,
+                         len(cont_columns), np.float32)
+        cls._write_array(os.path.join(to_dir, "y.npy"), [y_column()] if y_column else [], n,
+                         1 if y_column else 0, np.float32)
+        return cls(to_dir)
+
+    @classmethod
+    def from_data_frames(cls, df_cat, df_cont, y=None, *, to_dir):
+        """
+        Write the DataFrames columns to memory mapped files and returns the dataset
+        Args:
+            df_cat (DataFrame): The categorical variables already encoded to ints
+            df_cont (DataFrame): The continuous variables
+            y (np.ndarray, pd.Series, None): The target or None for a test set (filled with 0)
+            to_dir (str): The directory where the files are written
+
+        Returns:
+            MmapColumnarDataset: The dataset
+        """
+        cat_columns = [c.values for n, c in df_cat.items()]
+        cont_columns = [lambda c=c: c.values for n, c in df_cont.items()]
+        y_column = (lambda: np.asarray(y)) if y is not None else None
+        return cls._write(to_dir, len(df_cat) if df_cat.shape[1] else len(df_cont), cat_columns, cont_columns,
+                          y_column)
+
+    @classmethod
+    def from_data_frame(cls, df, cat_flds, y=None, *, to_dir):
+        """
+        Write the DataFrame columns to memory mapped files and returns the dataset
+        Args:
+            df (DataFrame): The DataFrame with the categorical variables already encoded to ints
+            cat_flds (list): The list of categorical fields, the other ones are considered continuous
+            y (np.ndarray, pd.Series, None): The target or None for a test set (filled with 0)
+            to_dir (str): The directory where the files are written
+
+        Returns:
+            MmapColumnarDataset: The dataset
+        """
+        return cls.from_data_frames(df[cat_flds], df.drop(cat_flds, axis=1), y, to_dir=to_dir)
+
+    @classmethod
+    def from_feather(cls, path, cat_flds, y_field=None, cont_flds=None, *, to_dir):
+        """
+        Write the columns of a Feather (Arrow IPC) file to memory mapped files without
+        loading the whole file in memory: the file is memory mapped and the columns are
+        read one at a time.
+        Args:
+            path (str): The Feather file
+            cat_flds (list): The list of categorical fields (already encoded to ints)
+            y_field (str, None): The target field or None for a test set (filled with 0)
+            cont_flds (list, None): The list of continuous fields or None to use all the
+                fields which are neither in cat_flds nor y_field
+            to_dir (str): The directory where the files are written
+
+        Returns:
+            MmapColumnarDataset: The dataset
+        """
+        with pa.memory_map(path) as source:
+            schema = pa.ipc.open_file(source).schema
+        if cont_flds is None:
+            cont_flds = [name for name in schema.names if name not in cat_flds and name != y_field]
+
+        def read_column(name):
+            table = feather.read_table(path, columns=[name], memory_map=True)
+            return table.column(0).to_numpy()
+
+        n = feather.read_table(path, columns=[schema.names[0]], memory_map=True).num_rows
+        cat_columns = [read_column(c) for c in cat_flds]
+        cont_columns = [lambda c=c: read_column(c) for c in cont_flds]
+        y_column = (lambda: read_column(y_field)) if y_field is not None else None
+        return cls._write(to_dir, n, cat_columns, cont_columns, y_column)
+
+
+class StreamingColumnarDataset(IterableDataset):
+    def __init__(self, files, cat_flds, y_field=None, encoder=None, batch_size=64, chunksize=100000,
+                 buffer_size=None, shuffle=True, read_csv_kwargs=None):
+        """
+        An iterable dataset which streams CSV or Feather files chunk by chunk so it can be
+        trained on data which doesn't fit in memory. Each chunk is transformed with a fitted
+        encoder and the batches are drawn from a bounded shuffle buffer.
+        The dataset yields whole [cats, conts, y] batches so it can be passed directly to
+        Learner.train() or wrapped in a DataLoader(ds, batch_size=None, num_workers=n),
+        in which case the files are split between the workers.
+        When shuffle=True the files order, the record batches order within the Feather files
+        and the blocks order within the record batches are shuffled at each epoch, then the rows
+        are shuffled within the buffer.
+        Args:
+            files (list): A list of .csv or .feather files
+            cat_flds (list): The list of categorical fields
+            y_field (str, None): The target field or None for a test set (filled with 0)
+            encoder (BaseEncoder, None): A fitted encoder (TreeEncoder/LinearEncoder) applied to each chunk
+                or None if the files are already encoded
+            batch_size (int): The batch size
+            chunksize (int): Number of rows read at once
+            buffer_size (int, None): Number of rows in the shuffle buffer, defaults to 2 * chunksize
+            shuffle (bool): If True shuffles the files, blocks and rows
+            read_csv_kwargs (dict, None): Arguments passed to pd.read_csv()
+        """
+        self.files = files
+        self.cat_flds = cat_flds
+        self.y_field = y_field
+        self.encoder = encoder
+        self.batch_size = batch_size
+        self.chunksize = chunksize
+        self.buffer_size = buffer_size if buffer_size is not None else 2 * chunksize
+        self.shuffle = shuffle
+        self.read_csv_kwargs = read_csv_kwargs or {}
+
+    def _read_chunks(self, path, rng):
+        if str(path).endswith(".csv"):
+            for chunk in pd.read_csv(path, chunksize=self.chunksize, **self.read_csv_kwargs):
+                yield chunk
+        else:
+            with pa.memory_map(str(path)) as source:
+                reader = pa.ipc.open_file(source)
+                batches = list(range(reader.num_record_batches))
+                if self.shuffle:
+                    rng.shuffle(batches)
+                for i in batches:
+                    # Each record batch is read (and decompressed) once then sliced in blocks
+                    batch = reader.get_batch(i)
+                    starts = list(range(0, batch.num_rows, self.chunksize))
+                    if self.shuffle:
+                        rng.shuffle(starts)
+                    for start in starts:
+                        yield batch.slice(start, self.chunksize).to_pandas()
+
+    def _to_arrays(self, chunk):
+        n = len(chunk)
+        y = chunk[self.y_field].values.astype(np.float32) if self.y_field else np.zeros(n, dtype=np.float32)
+        if self.encoder is not None:
+            chunk = self.encoder.transform(chunk, verbose=False)
+        elif self.y_field:
+            chunk = chunk.drop(self.y_field, axis=1)
+        cont_flds = [c for c in chunk.columns if c not in self.cat_flds]
+        cats = chunk[self.cat_flds].values.astype(np.int64) if self.cat_flds else np.zeros((n, 1), dtype=np.int64)
+        conts = chunk[cont_flds].values.astype(np.float32) if cont_flds else np.zeros((n, 1), dtype=np.float32)
+        return [cats, conts, y[:, None]]
+
+    def _emit(self, buffer, rng, keep):
+        """
+        Shuffle the buffer and yield batches from it until `keep` rows are left
+        """
+        arrays = [np.concatenate(arrs) for arrs in zip(*buffer)]
+        n = len(arrays[0])
+        if self.shuffle:
+            perm = rng.permutation(n)
+            arrays = [arr[perm] for arr in arrays]
+        stop = max(0, n - keep) // self.batch_size * self.batch_size if keep > 0 else n
+        for start in range(0, stop, self.batch_size):
+            yield [torch.from_numpy(arr[start:start + self.batch_size]) for arr in arrays]
+        return [[arr[stop:] for arr in arrays]] if stop < n else []
+
+    def __iter__(self):
+        worker_info = get_worker_info()
+        files = list(self.files)
+        if worker_info is not None:
+            files = files[worker_info.id::worker_info.num_workers]
+        rng = np.random.RandomState(torch.randint(0, 2 ** 31 - 1, (1,)).item())
+        if self.shuffle:
+            rng.shuffle(files)
+
+        buffer, buffer_rows = [], 0
+        for path in files:
+            for chunk in self._read_chunks(path, rng):
+                buffer.append(self._to_arrays(chunk))
+                buffer_rows += len(chunk)
+                if buffer_rows >= self.buffer_size:
+                    # Keep half of the buffer to mix it with the next chunks
+                    buffer = yield from self._emit(buffer, rng, keep=self.buffer_size // 2)
+                    buffer_rows = sum(len(arrs[0]) for arrs in buffer)
+        if buffer_rows > 0:
+            yield from self._emit(buffer, rng, keep=0)
+
+
+def _remove_cache_dir(cache_dir, owner_pid):
+    # Forked DataLoader workers inherit the finalizers, only the creating process removes the directory
+    if os.getpid() == owner_pid:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+class CachedDataset(Dataset):
+    def __init__(self, dataset: Dataset, cache_dir=None, max_bytes=2 * 1024 ** 3):
+        """
+        Wrap a dataset and cache its transformed samples on their first access so the
+        next epochs don't have to decode and transform them again.
+        The samples are stored as files in `cache_dir` (in shared memory by default) which
+        makes them readable by all the DataLoader workers. Once the cache grows over `max_bytes`
+        the least recently used samples are evicted.
+        Each worker only rescans the cache when it wrote more than 10% of `max_bytes`
+        so the budget may be exceeded by that amount per worker.
+
+        /!\ Only wrap datasets with deterministic transformations (validation sets,
+        EvalDataset, TrainDataset(random_augmentations=False)...) otherwise every epoch
+        will get the same augmented samples.
+        Args:
+            dataset (Dataset): The dataset to cache
+            cache_dir (str, None): The directory where the samples are stored or None to
+                create a temporary directory in /dev/shm (or the default temporary directory
+                if /dev/shm is not available). A temporary directory is removed with the dataset
+                or at exit.
+            max_bytes (int): The maximum size of the cache in bytes
+        """
+        self.dataset = dataset
+        self.max_bytes = max_bytes
+        self.owns_cache_dir = cache_dir is None
+        if cache_dir is None:
+            shm_dir = "/dev/shm"
+            cache_dir = tempfile.mkdtemp(prefix="torchlite_cache_",
+                                         dir=shm_dir if os.path.isdir(shm_dir) else None)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        if self.owns_cache_dir:
+            # The temporary directory (in RAM for /dev/shm) is removed when the dataset is garbage
+            # collected or at exit if clear() wasn't called
+            weakref.finalize(self, _remove_cache_dir, cache_dir, os.getpid())
+        self._used_bytes = None
+        self._written_bytes = 0
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def _get_path(self, idx):
+        return os.path.join(self.cache_dir, "{}.pkl".format(idx))
+
+    def _scan(self):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".pkl"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        """
+        Remove the least recently used samples until the cache fits in 90% of max_bytes
+        """
+        entries = sorted(self._scan())
+        used_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if used_bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            used_bytes -= size
+        self._used_bytes = used_bytes
+        self._written_bytes = 0
+
+    def _store(self, idx, sample):
+        data = pickle.dumps(sample, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        if self._used_bytes is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._used_bytes = sum(size for _, size, _ in self._scan())
+
+        path = self._get_path(idx)
+        # Write to a temporary file first so other workers never read a partial sample
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self._used_bytes += len(data)
+        self._written_bytes += len(data)
+        if self._used_bytes > self.max_bytes or self._written_bytes > self.max_bytes * 0.1:
+            self._evict()
+
+    def __getitem__(self, idx):
+        path = self._get_path(idx)
+        try:
+            with open(path, "rb") as f:
+                sample = pickle.load(f)
+            # Refresh the modification time which is used as the LRU clock
+            os.utime(path)
+            return sample
+        except (FileNotFoundError, EOFError):
+            # Not cached yet or evicted by another worker
+            pass
+
+        sample = self.dataset[idx]
+        self._store(idx, sample)
+        return sample
+
+    def clear(self):
+        """
+        Remove all the cached samples. The cache directory is deleted as well if it
+        was created by this dataset (it will be created again on the next access).
+        """
+        if self.owns_cache_dir:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+        else:
+            for _, _, path in self._scan():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self._used_bytes = None
+        self._written_bytes = 0
@@ -1,3 +1,4 @@
+import torch
 import torch.utils.data.sampler as sampler
 
 
@@ -17,3 +18,38 @@ class ChunkSampler(sampler.Sampler):
 
     def __len__(self):
         return self.num_samples
+
+
+class MultiCropBatchSampler(sampler.Sampler):
+    """Yields batches of image indices for datasets returning multiple crops per item
+    (like srpgan.TrainDataset(crops_per_image > 1)) so that the flattened batches
+    contain about batch_size crops.
+    Arguments:
+        num_images: # of images in the dataset
+        batch_size: # of crops per batch
+        crops_per_image: # of crops returned for each image
+        shuffle: if True the images are reshuffled at every epoch
+        drop_last: if True the last incomplete batch is dropped
+    """
+
+    def __init__(self, num_images, batch_size, crops_per_image, shuffle=True, drop_last=False):
+        self.num_images = num_images
+        self.images_per_batch = max(1, batch_size // crops_per_image)
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+
+    def __iter__(self):
+        if self.shuffle:
+            indices = torch.randperm(self.num_images).tolist()
+        else:
+            indices = list(range(self.num_images))
+        for i in range(0, len(indices), self.images_per_batch):
+            batch = indices[i:i + self.images_per_batch]
+            if len(batch) < self.images_per_batch and self.drop_last:
+                return
+            yield batch
+
+    def __len__(self):
+        if self.drop_last:
+            return self.num_images // self.images_per_batch
+        return (self.num_images + self.images_per_batch - 1) // self.images_per_batch
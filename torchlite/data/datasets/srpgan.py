@@ -1,3 +1,4 @@
+import torch
 from torch.utils.data import Dataset
 import torchvision.transforms as transforms
 from torchlite.torch.transforms import PillowAug
@@ -8,8 +9,23 @@ def calculate_valid_crop_size(crop_size, upscale_factor):
     return crop_size - (crop_size % upscale_factor)
 
 
+def multi_crop_collate(batch):
+    """
+    Collate function flattening the crops returned by TrainDataset(crops_per_image > 1)
+    into a single batch of size (n_images * crops_per_image, C, H, W)
+    Args:
+        batch (list): A list of (lr_images, hr_images) tuples of size (crops_per_image, C, H, W)
+
+    Returns:
+        list: The [lr_images, hr_images] batch
+    """
+    lr_images, hr_images = zip(*batch)
+    return [torch.cat(lr_images, 0), torch.cat(hr_images, 0)]
+
+
 class TrainDataset(Dataset):
-    def __init__(self, hr_image_filenames: list, crop_size, upscale_factor, random_augmentations=True):
+    def __init__(self, hr_image_filenames: list, crop_size, upscale_factor, random_augmentations=True,
+                 crops_per_image=1):
         """
         The train dataset for SRPGAN.
         The dataset takes one unique list of files
@@ -18,9 +34,17 @@ class TrainDataset(Dataset):
             crop_size (int): Size of the crop
             upscale_factor (int): The upscale factor, either 2, 4 or 8
             random_augmentations (bool): True if the images need to be randomly augmented, False otherwise
+            crops_per_image (int): Number of random crops extracted from each decoded image.
+                If > 1 each item is a (lr_images, hr_images) tuple of tensors of size
+                (crops_per_image, C, H, W) which saves the decoding of a full image per crop.
+                Use it with samplers.MultiCropBatchSampler and multi_crop_collate to get
+                flat batches.
         """
+        assert crops_per_image == 1 or random_augmentations, \
+            "crops_per_image > 1 requires random_augmentations, the center crops would be identical"
 
         self.hr_image_filenames = hr_image_filenames
+        self.crops_per_image = crops_per_image
         self.crop_size = calculate_valid_crop_size(crop_size, upscale_factor)
         self.hr_transform = transforms.Compose([
             transforms.RandomCrop(self.crop_size) if random_augmentations else transforms.CenterCrop(self.crop_size),
@@ -42,6 +66,13 @@ class TrainDataset(Dataset):
         img = Image.open(self.hr_image_filenames[index])
         assert img.height >= self.crop_size and img.width >= self.crop_size, \
             "Image {} too little for crop_size".format(self.hr_image_filenames[index])
+        if self.crops_per_image > 1:
+            # Decode the image once and take all the crops from it
+            img.load()
+            hr_images = [self.hr_transform(img) for _ in range(self.crops_per_image)]
+            lr_images = [self.lr_transform(hr_image.clone()) for hr_image in hr_images]
+            return torch.stack(lr_images), torch.stack(hr_images)
+
         hr_image = self.hr_transform(img)
         lr_image = self.lr_transform(hr_image.clone())
 
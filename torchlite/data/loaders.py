@@ -0,0 +1,163 @@
+"""
+This module contains data loaders which can be used in place of torch.utils.data.DataLoader
+"""
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import torch
+from torch.utils.data.dataloader import default_collate
+from torchlite.data.datasets import to_sparse_csr_tensor
+
+
+class ThreadedDataLoader:
+    def __init__(self, dataset, batch_size=1, shuffle=False, num_threads=os.cpu_count(),
+                 collate_fn=default_collate, ordered=True, prefetch_batches=2, drop_last=False):
+        """
+        An in-process alternative to DataLoader which loads the batches with a pool of threads
+        instead of worker processes. It avoids the workers startup, the duplication of the
+        dataset in each worker and the pickling of every sample, which makes it faster for
+        workloads releasing the GIL (Pillow decoding, numpy/torch operations).
+        Each thread loads and collates a whole batch.
+        Args:
+            dataset (Dataset): The dataset to load the samples from
+            batch_size (int): The batch size
+            shuffle (bool): If True the samples are reshuffled at every epoch
+            num_threads (int): Number of threads used to load the batches
+            collate_fn (callable): Merges a list of samples into a batch
+            ordered (bool): If True the batches are returned in the sampling order. If False
+                they are returned as soon as they are loaded.
+            prefetch_batches (int): Number of batches loaded in advance per thread
+            drop_last (bool): If True the last incomplete batch is dropped
+        """
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.num_threads = num_threads
+        self.collate_fn = collate_fn
+        self.ordered = ordered
+        self.prefetch_batches = prefetch_batches
+        self.drop_last = drop_last
+        self._executor = None
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.dataset) // self.batch_size
+        return (len(self.dataset) + self.batch_size - 1) // self.batch_size
+
+    def _get_batches_indices(self):
+        n = len(self.dataset)
+        indices = torch.randperm(n).tolist() if self.shuffle else list(range(n))
+        for i in range(0, n, self.batch_size):
+            batch = indices[i:i + self.batch_size]
+            if len(batch) < self.batch_size and self.drop_last:
+                return
+            yield batch
+
+    def _load_batch(self, indices):
+        return self.collate_fn([self.dataset[i] for i in indices])
+
+    def __iter__(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+        max_pending = self.num_threads * self.prefetch_batches
+        batches = self._get_batches_indices()
+
+        if self.ordered:
+            pending = deque()
+            try:
+                for indices in batches:
+                    pending.append(self._executor.submit(self._load_batch, indices))
+                    if len(pending) >= max_pending:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+        else:
+            pending = set()
+            try:
+                for indices in batches:
+                    pending.add(self._executor.submit(self._load_batch, indices))
+                    if len(pending) >= max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def shutdown(self):
+        """
+        Stop the threads of the loader
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+class ColumnarLoader:
+    def __init__(self, dataset, batch_size=1, shuffle=False, drop_last=False):
+        """
+        A loader for ColumnarDataset which gets whole batches at once instead of
+        getting and collating each row separately. The batch indices are sampled as one
+        array and the columns are sliced with a single fancy index (or a contiguous view
+        when shuffle=False) then turned into tensors without copy.
+        No worker process is used.
+        Args:
+            dataset (ColumnarDataset): A dataset accepting arrays of indices in __getitem__
+            batch_size (int): The batch size
+            shuffle (bool): If True the samples are reshuffled at every epoch
+            drop_last (bool): If True the last incomplete batch is dropped
+        """
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.dataset) // self.batch_size
+        return (len(self.dataset) + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        n = len(self.dataset)
+        perm = torch.randperm(n).numpy() if self.shuffle else None
+        for start in range(0, len(self) * self.batch_size, self.batch_size):
+            stop = min(start + self.batch_size, n)
+            if perm is not None:
+                # Sorted indices give a better memory locality and keep the same batch content
+                indices = np.sort(perm[start:stop])
+            else:
+                indices = slice(start, stop)
+            yield [torch.from_numpy(np.ascontiguousarray(col)) for col in self.dataset[indices]]
+
+
+class SparseLoader(ColumnarLoader):
+    def __init__(self, dataset, batch_size=1, shuffle=False, drop_last=False):
+        """
+        A loader for SparseDataset which slices the CSR matrix once per batch with the whole
+        array of batch indices instead of slicing and stacking the rows one by one.
+        The batches are [torch.sparse_csr inputs, dense targets].
+        No worker process is used.
+        Args:
+            dataset (SparseDataset): A dataset accepting arrays of indices in __getitem__
+            batch_size (int): The batch size
+            shuffle (bool): If True the samples are reshuffled at every epoch
+            drop_last (bool): If True the last incomplete batch is dropped
+        """
+        super().__init__(dataset, batch_size, shuffle, drop_last)
+
+    def __iter__(self):
+        n = len(self.dataset)
+        perm = torch.randperm(n).numpy() if self.shuffle else None
+        for start in range(0, len(self) * self.batch_size, self.batch_size):
+            stop = min(start + self.batch_size, n)
+            indices = np.sort(perm[start:stop]) if perm is not None else slice(start, stop)
+            X, y = self.dataset[indices]
+            yield [to_sparse_csr_tensor(X), torch.from_numpy(np.ascontiguousarray(y))]
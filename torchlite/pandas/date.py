@@ -7,11 +7,75 @@ def lookup(s, date_format):
     """
     This is an extremely fast approach to datetime parsing.
     For large data, the same dates are often repeated. Rather than
-    re-parse these, we store all unique dates, parse them, and
-    use a lookup to convert all dates.
+    re-parse these, we parse the unique dates only and broadcast them
+    back to the rows with their codes.
     """
-    dates = {date: pd.to_datetime(date, format=date_format) for date in s.unique()}
-    return s.map(dates)
+    codes, uniques = pd.factorize(s)
+    dates = pd.to_datetime(uniques, format=date_format)
+    return pd.Series(dates.take(codes, allow_fill=True, fill_value=pd.NaT), index=s.index, name=s.name)
+
+
+# Date parts computed with datetime64 arithmetic and their dtype
+_INT_PARTS = {'year': np.int16, 'month': np.int8, 'week': np.int8, 'day': np.int8, 'dayofweek': np.int8,
+              'dayofyear': np.int16, 'quarter': np.int8}
+_BOOL_PARTS = ('is_month_end', 'is_month_start', 'is_quarter_end', 'is_quarter_start', 'is_year_end',
+               'is_year_start')
+
+
+def _get_dateparts(dates, transform_list):
+    """
+    Compute the date parts of (unique) dates
+    Args:
+        dates (pd.DatetimeIndex): The dates, without NaT
+        transform_list (list): The date parts
+
+    Returns:
+        pd.DataFrame: One column per date part
+    """
+    parts = {}
+    if dates.tz is not None:
+        # Only the naive dates are handled with datetime64 arithmetic
+        return pd.DataFrame({n: getattr(dates, n.lower()) for n in transform_list})
+
+    values = dates.values
+    days, months, years = [values.astype(unit) for unit in ('datetime64[D]', 'datetime64[M]', 'datetime64[Y]')]
+    year = years.astype(np.int64) + 1970
+    month = (months - years).astype(np.int64) + 1
+    day = (days - months).astype(np.int64) + 1
+    # 1970-01-01 was a Thursday, Monday=0
+    dayofweek = (days.astype(np.int64) + 3) % 7
+    dayofyear = (days - years).astype(np.int64) + 1
+    is_month_end = (days + 1).astype('datetime64[M]') != months
+    computed = {
+        'year': lambda: year,
+        'month': lambda: month,
+        'day': lambda: day,
+        'dayofweek': lambda: dayofweek,
+        'dayofyear': lambda: dayofyear,
+        'quarter': lambda: (month - 1) // 3 + 1,
+        # ISO week: the week of the year containing the Thursday of the week
+        'week': lambda: _iso_week(days, dayofweek),
+        'is_month_end': lambda: is_month_end,
+        'is_month_start': lambda: day == 1,
+        'is_quarter_end': lambda: is_month_end & (month % 3 == 0),
+        'is_quarter_start': lambda: (day == 1) & (month % 3 == 1),
+        'is_year_end': lambda: (month == 12) & (day == 31),
+        'is_year_start': lambda: dayofyear == 1,
+    }
+    for n in transform_list:
+        key = n.lower()
+        if key in computed:
+            part = computed[key]()
+            parts[n] = part.astype(_INT_PARTS[key]) if key in _INT_PARTS else part
+        else:
+            # Other parts (hour, days_in_month...) are taken from pandas, on the unique dates only
+            parts[n] = np.asarray(getattr(dates, key))
+    return pd.DataFrame(parts)
+
+
+def _iso_week(days, dayofweek):
+    thursday = days - dayofweek + 3
+    return (thursday - thursday.astype('datetime64[Y]')).astype(np.int64) // 7 + 1
 
 
 def get_datepart(df, field_name, transform_list=('Year', 'Month', 'Week', 'Day',
@@ -23,7 +87,9 @@ def get_datepart(df, field_name, transform_list=('Year', 'Month', 'Week', 'Day',
     """
     Converts a column of df from a datetime64 to many columns containing
     the information from the date. `transform_list` is the list of transformations.
-    A field "Elapsed" is always added to the resulting DataFrame.
+    The date column is factorized once and the parts are computed on the unique dates only
+    then broadcast to the rows. The int parts use the narrowest int type (int8 or int16)
+    or float64 if the column contains NaT.
 
     Args:
         df (pd.DataFrame): A pandas DataFrame
@@ -40,24 +106,38 @@ def get_datepart(df, field_name, transform_list=('Year', 'Month', 'Week', 'Day',
     field = df[field_name]
     targ_pre = re.sub('[Dd]ate$', '', field_name)
 
-    if isinstance(df, pd.DataFrame):
-        if not np.issubdtype(field.dtype, np.datetime64):
-            df[field_name] = field = lookup(field, date_format)
+    codes, uniques = pd.factorize(field)
+    if not np.issubdtype(field.dtype, np.datetime64):
+        uniques = pd.to_datetime(uniques, format=date_format)
+        df[field_name] = uniques.take(codes, allow_fill=True, fill_value=pd.NaT)
+    parts = _get_dateparts(pd.DatetimeIndex(uniques), transform_list)
+
+    if (codes < 0).any():
+        # Missing dates get NaN (or False) like with the .dt accessor
+        missing = pd.DataFrame({n: [False if parts[n].dtype == bool else np.nan] for n in parts.columns})
+        parts = pd.concat([parts, missing], ignore_index=True)
+        codes = np.where(codes < 0, len(parts) - 1, codes)
+    parts = parts.take(codes)
     for n in transform_list:
-        df[targ_pre + n] = getattr(field.dt, n.lower())
-        if df[targ_pre + n].dtype == np.int64:
-            df[targ_pre + n] = df[targ_pre + n].astype(np.int16)
+        df[targ_pre + n] = parts[n].values
 
     if drop:
         df = df.drop(field_name, axis=1)
     return df
 
 
+_NS_PER_DAY = 24 * 3600 * 10 ** 9
+
+
+def _to_datetime64(dates):
+    return np.asarray(dates, dtype='datetime64[ns]')
+
+
 def get_elapsed(df, date_field, from_date=np.datetime64('1970-01-01'), prefix='Elapsed_',
                 inplace=False, dtype='timedelta64[s]'):
     """
     This function will add a new column which will count the time elapsed relative to a particular
-    date (1970-01-01 by default)
+    date (1970-01-01 by default). The whole column is converted at once with datetime64 arithmetic.
     Args:
         df (pd.DataFrame): A pandas DataFrame
         date_field (str): The field containing the field of type datetime64
@@ -67,30 +147,316 @@ def get_elapsed(df, date_field, from_date=np.datetime64('1970-01-01'), prefix='E
         inplace (bool): If the operations are done inplace or not
         dtype (str): "timedelta64[s]" for seconds, "timedelta64[m]" for minutes, "timedelta64[h]" for hours,
             "timedelta64[D]" for days, "timedelta64[M]" for months, "timedelta64[Y]" for years.
+            Months and years are calendar units: the number of month (year) starts between
+            from_date and the date.
     Returns:
         DataFrame: The passed DataFrame with the elapsed time column
     """
     if not inplace:
         df = df.copy()
 
-    res = [None] * df.shape[0]
-    ts_type = "unknown"
-    for i, v in enumerate(df[date_field].values):
-        diff = (v - from_date).astype(dtype)
-        ts_type = str(diff).split(" ")[-1]
-        res[i] = diff.astype(np.int64)
+    unit = np.datetime_data(np.dtype(dtype))[0]
+    ts_type = str(np.timedelta64(2, unit)).split(" ")[-1]
+    values = _to_datetime64(df[date_field].values)
+    from_date = np.datetime64(from_date)
+    if unit in ('M', 'Y'):
+        calendar_unit = 'datetime64[{}]'.format(unit)
+        diff = values.astype(calendar_unit) - from_date.astype(calendar_unit)
+    else:
+        diff = (values - from_date).astype(dtype)
+
+    df[prefix + ts_type] = diff.astype(np.int64)
+    return df
+
+
+def iso_week_to_date(year, week, weekday=0):
+    """
+    Returns the dates of ISO weeks, by default their Monday.
+    Equivalent to isoweek.Week(year, week).day(weekday) on arrays.
+    Args:
+        year (np.ndarray, pd.Series): The ISO years
+        week (np.ndarray, pd.Series): The ISO weeks (1 to 53)
+        weekday (int, np.ndarray): The day of the week, Monday=0
+
+    Returns:
+        np.ndarray: The dates as datetime64[ns]
+    """
+    year = np.asarray(year, dtype=np.int64)
+    week = np.asarray(week, dtype=np.int64)
+    # The 4th of January is always in the first ISO week
+    jan4 = (year - 1970).astype('datetime64[Y]').astype('datetime64[D]') + 3
+    jan4_dayofweek = (jan4.astype(np.int64) + 3) % 7
+    dates = jan4 - jan4_dayofweek + (week - 1) * 7 + weekday
+    return dates.astype('datetime64[ns]')
+
+
+def days_between(start, end):
+    """
+    Returns the number of days from start to end, like (end - start).dt.days
+    Args:
+        start (np.ndarray, pd.Series): The start dates
+        end (np.ndarray, pd.Series): The end dates
+
+    Returns:
+        np.ndarray: The days as int64, or float64 with NaN where a date is missing
+    """
+    diff = _to_datetime64(end) - _to_datetime64(start)
+    missing = np.isnat(diff)
+    days = np.where(missing, 0, diff.view(np.int64)) // _NS_PER_DAY
+    if missing.any():
+        days = np.where(missing, np.nan, days)
+    return days
+
+
+def _get_group_codes(df, by):
+    """
+    Returns an int64 code per row identifying its group (0 for all the rows if by is None).
+    Like in groupby() the rows with a missing key don't belong to any group, their code is -1.
+    """
+    if by is None:
+        return np.zeros(df.shape[0], dtype=np.int64)
+    if isinstance(by, str):
+        by = [by]
+    return df.groupby(by, sort=False).ngroup().fillna(-1).values.astype(np.int64)
+
+
+def _get_group_bounds(sorted_codes):
+    """
+    Returns for each row of group sorted codes the position of the first and last row of its group
+    """
+    n = len(sorted_codes)
+    pos = np.arange(n)
+    is_start = np.ones(n, dtype=bool)
+    is_start[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    is_end = np.ones(n, dtype=bool)
+    is_end[:-1] = is_start[1:]
+    starts = np.maximum.accumulate(np.where(is_start, pos, 0))
+    ends = np.minimum.accumulate(np.where(is_end, pos, n)[::-1])[::-1]
+    return starts, ends
+
+
+def get_event_elapsed(df, event_fields, date_field='Date', by=None, since_prefix='After', until_prefix='Before',
+                      unit='D', inplace=False):
+    """
+    For each event column, adds the time elapsed since the last event and the time until the next event
+    (the rows where the event column is truthy) within each group, e.g. the days since the last promo per store.
+    The rows are sorted once by group and date (the DataFrame itself is left in its order) and the
+    last/next event positions are found with cumulative max/min over the sorted arrays.
+    Rows without previous (next) event in their group and rows with a missing `by` key get NaN.
+    Args:
+        df (pd.DataFrame): A pandas DataFrame
+        event_fields (list, str): The event columns
+        date_field (str): The column of type datetime64 (without missing values)
+        by (list, str, None): Columns defining the groups
+        since_prefix (str, None): Prefix of the time since the last event columns. None to skip them
+        until_prefix (str, None): Prefix of the time until the next event columns. None to skip them
+        unit (str): The time unit: "D" for days, "h" for hours, "m" for minutes, "s" for seconds...
+        inplace (bool): If the operations are done inplace or not
+
+    Returns:
+        DataFrame: The passed DataFrame with the new columns
+    """
+    if not inplace:
+        df = df.copy()
+    if isinstance(event_fields, str):
+        event_fields = [event_fields]
+
+    n = df.shape[0]
+    dates = _to_datetime64(df[date_field].values).view(np.int64)
+    codes = _get_group_codes(df, by)
+    order = np.lexsort((dates, codes))
+    sorted_dates = dates[order]
+    starts, ends = _get_group_bounds(codes[order])
+    no_group = codes[order] < 0
+    pos = np.arange(n)
+    unit_ns = np.timedelta64(1, unit).astype('timedelta64[ns]').view(np.int64)
 
-    df[prefix + ts_type] = res
+    for field in event_fields:
+        events = df[field].fillna(0).values.astype(bool)[order]
+        if since_prefix is not None:
+            last = np.maximum.accumulate(np.where(events, pos, -1))
+            elapsed = ((sorted_dates - sorted_dates[np.maximum(last, 0)]) // unit_ns).astype(np.float64)
+            elapsed[(last < starts) | no_group] = np.nan
+            res = np.empty(n)
+            res[order] = elapsed
+            df[since_prefix + field] = res
+        if until_prefix is not None:
+            following = np.minimum.accumulate(np.where(events, pos, n)[::-1])[::-1]
+            remaining = ((sorted_dates[np.minimum(following, n - 1)] - sorted_dates) // unit_ns).astype(np.float64)
+            remaining[(following > ends) | no_group] = np.nan
+            res = np.empty(n)
+            res[order] = remaining
+            df[until_prefix + field] = res
     return df
 
 
+_WINDOW_AGGS = ('sum', 'mean', 'min', 'max', 'std')
+
+
+def _feature_name(column, by, suffix):
+    if by is not None:
+        return column + '_BY[' + '_'.join(by) + ']_' + suffix
+    return column + '_' + suffix
+
+
+def _window_bounds(starts, ends, size, direction):
+    """
+    Returns the first and last (inclusive) positions of the window of each row, clipped to its group
+    """
+    pos = np.arange(len(starts))
+    if direction == 'backward':
+        return np.maximum(pos - size + 1, starts), pos
+    elif direction == 'forward':
+        return pos, np.minimum(pos + size - 1, ends)
+    raise Exception("Unknown window direction: {}".format(direction))
+
+
+def _range_sum(values, lo, hi, block):
+    """
+    Sum values[lo:hi + 1] for each row, with hi - lo < block. The cumulative sums are restarted
+    every block rows so their rounding errors don't grow with the number of rows.
+    """
+    n = len(values)
+    n_blocks = -(-n // block)
+    padded = np.zeros(n_blocks * block)
+    padded[:n] = values
+    padded = padded.reshape(n_blocks, block)
+    prefix = np.cumsum(padded, axis=1).ravel()[:n]
+    suffix = np.cumsum(padded[:, ::-1], axis=1)[:, ::-1].ravel()[:n]
+    same_block = lo // block == hi // block
+    return np.where(same_block, prefix[hi] - prefix[lo] + values[lo], suffix[lo] + prefix[hi])
+
+
+def _range_reduce(values, lo, hi, func):
+    """
+    Reduce values[lo:hi + 1] for each row with func (np.fmin or np.fmax). The ranges are covered by
+    two overlapping blocks of size 2^k and the blocks reductions are computed level by level
+    (sparse table) so only O(n) memory is used whatever the window size.
+    """
+    res = np.empty(len(values))
+    level = np.floor(np.log2(hi - lo + 1)).astype(np.int64)
+    blocks = values
+    for k in range(level.max() + 1 if len(values) > 0 else 0):
+        if k > 0:
+            half = 2 ** (k - 1)
+            blocks = func(blocks[:-half], blocks[half:])
+        rows = np.nonzero(level == k)[0]
+        res[rows] = func(blocks[lo[rows]], blocks[hi[rows] - 2 ** k + 1])
+    return res
+
+
+def _window_aggregate(values, lo, hi, size, agg, min_periods):
+    missing = np.isnan(values)
+    filled = np.where(missing, 0., values)
+    count = _range_sum((~missing).astype(np.float64), lo, hi, size)
+    if agg == 'sum':
+        res = _range_sum(filled, lo, hi, size)
+    elif agg == 'mean':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            res = _range_sum(filled, lo, hi, size) / count
+    elif agg == 'std':
+        # Centered values limit the loss of precision of the sum of squares
+        centered = np.where(missing, 0., values - np.nanmean(values)) if count.any() else filled
+        sums = _range_sum(centered, lo, hi, size)
+        squares = _range_sum(centered ** 2, lo, hi, size)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            res = np.sqrt(np.maximum(squares - sums ** 2 / count, 0.) / (count - 1))
+        res[_range_reduce(values, lo, hi, np.fmin) == _range_reduce(values, lo, hi, np.fmax)] = 0.
+        res[count < 2] = np.nan
+    elif agg in ('min', 'max'):
+        res = _range_reduce(values, lo, hi, np.fmin if agg == 'min' else np.fmax)
+    else:
+        raise Exception("Unknown window aggregation: {}, use one of {}".format(agg, _WINDOW_AGGS))
+    res[count < max(min_periods, 1)] = np.nan
+    return res
+
+
+def get_window_features(df_list, lags=(), windows=(), by=None, sort_by=None, min_periods=1):
+    """
+    Compute lag and rolling window features over the rows of the DataFrames of df_list taken
+    as one table. The rows are sorted once by group (and sort_by) then every feature is computed
+    on the sorted arrays: lags by shifting within the group bounds, sum/mean/std with blockwise
+    cumulative sums and min/max with a sparse table. Only the needed columns are gathered, the DataFrames are not
+    concatenated nor copied.
+    As with groupby() the rows with a missing `by` key don't belong to any group and get NaN.
+    E.g:
+        get_window_features([train, test], lags=[("Sales", 1), ("Sales", 7)],
+                            windows=[("Promo", 7, "sum", "backward"), ("Promo", 7, "sum", "forward")],
+                            by="Store", sort_by="Date")
+    Args:
+        df_list (list): A list of pandas DataFrame.
+            /!\ Without sort_by pass the DataFrame in order, for instance: [train_df, val_df, test_df]
+        lags (list): List of (column, t) with t the lag steps (negative for leads). The lags keep the dtype
+            of their column as with Series.shift() (missing values are NaN/NaT, ints become float64)
+        windows (list): List of (column, size, agg, direction) with size the number of rows of the window,
+            agg one of "sum", "mean", "min", "max", "std" and direction "backward" (the row and the
+            size - 1 previous ones) or "forward" (the row and the size - 1 next ones)
+        by (list, str, None): List of columns to group by
+        sort_by (list, str, None): Columns ordering the rows within the groups. None to keep the rows order
+        min_periods (int): Minimum number of non missing values in a window, NaN is returned otherwise
+
+    Returns:
+        list: A pandas DataFrame of the new columns (float64 for the windows) for each DataFrame
+            of df_list, with the same index
+    """
+    if isinstance(by, str):
+        by = [by]
+    if isinstance(sort_by, str):
+        sort_by = [sort_by]
+    sizes = [df.shape[0] for df in df_list]
+    n = sum(sizes)
+
+    def gather(col):
+        return np.concatenate([np.asarray(df[col].values) for df in df_list]) if n > 0 else np.array([])
+
+    codes = _get_group_codes(pd.DataFrame({col: gather(col) for col in by}), by) if by is not None \
+        else np.zeros(n, dtype=np.int64)
+    sort_keys = [gather(col) for col in reversed(sort_by)] if sort_by is not None else []
+    order = np.lexsort(sort_keys + [codes])
+    starts, ends = _get_group_bounds(codes[order])
+    no_group = codes[order] < 0
+    pos = np.arange(n)
+
+    # The lags are taken from the columns themselves to keep their dtype (strings, categories, dates...)
+    lagged_values = {}
+    for col in set(col for col, _ in lags):
+        lagged_values[col] = pd.concat([df[col] for df in df_list], ignore_index=True).iloc[order] \
+            .reset_index(drop=True)
+    sorted_values = {}
+    for col in set(w[0] for w in windows):
+        sorted_values[col] = gather(col).astype(np.float64)[order]
+
+    features = {}
+    for col, t in lags:
+        shifted = pos - t
+        valid = (shifted >= starts) & (shifted <= ends) & ~no_group
+        features[_feature_name(col, by, "lag_" + str(t))] = lagged_values[col].iloc[
+            np.clip(shifted, 0, max(n - 1, 0))].reset_index(drop=True).where(valid)
+    for col, size, agg, direction in windows:
+        lo, hi = _window_bounds(starts, ends, size, direction)
+        suffix = "{}_{}_{}".format(agg, size, "bw" if direction == "backward" else "fw")
+        res = _window_aggregate(sorted_values[col], lo, hi, size, agg, min_periods)
+        res[no_group] = np.nan
+        features[_feature_name(col, by, suffix)] = res
+
+    def take(values, rows):
+        return values.iloc[rows].values if isinstance(values, pd.Series) else values[rows]
+
+    # Back to the rows order
+    inverse = np.empty(n, dtype=np.int64)
+    inverse[order] = pos
+    bounds = np.cumsum([0] + sizes)
+    return [pd.DataFrame({name: take(values, inverse[bounds[i]:bounds[i + 1]]) for name, values in features.items()},
+                         index=df.index) for i, df in enumerate(df_list)]
+
+
 def add_lag(df_list, column, by=None, t=1):
     """
-    Add lag values to the df in df_list
+    Add lag values to the df in df_list, see get_window_features() to compute many lags at once
     Args:
         df_list (list): A list of pandas DataFrame. The DataFrames must
-            have matching columns as they will be concatenated together to
-            calculate the lags and then split back.
+            have matching columns as they are taken as one table to
+            calculate the lags.
             /!\ Pass the DataFrame in order, for instance: [train_df, val_df, test_df]
         column (str): The column on which to apply the lag
         by (list, str, None): List of columns to group by before applying the lag
@@ -100,26 +466,6 @@ def add_lag(df_list, column, by=None, t=1):
         list: List of pandas DataFrames similar to the one passed in parameter
         with lag values.
     """
-    df_col_count = np.array([0] + [df.shape[0] for df in df_list]).cumsum()
-    df_col_names = [(list(df.columns), list(df.dtypes)) for df in df_list]
-
-    df = pd.DataFrame()
-    for df_c in df_list:
-        df = pd.concat([df, df_c], axis=0)
-
-    if by is not None:
-        if type(by) == str:
-            by = [by]
-        shifted_col = df.groupby(by)[column].shift(t)
-        shifted_col.rename(column + '_BY[' + '_'.join(by) + "]_lag_" + str(t), inplace=True)
-    else:
-        shifted_col = df[column].shift(t)
-        shifted_col.rename(column + "_lag_" + str(t), inplace=True)
-    df = pd.concat([df, shifted_col], axis=1)
-
-    # Restore DataFrames
-    df_list = [df.iloc[df_col_count[i]:df_col_count[i + 1]] for i in range(len(df_col_count) - 1)]
-    df_list = [df[cols + [shifted_col.name]].astype(dict(zip(cols, dtypes))) for df, (cols, dtypes) in
-               zip(df_list, df_col_names)]
-
-    return df_list
+    features = get_window_features(df_list, lags=[(column, t)], by=by)
+    return [df.assign(**{name: feats[name].values for name in feats.columns})
+            for df, feats in zip(df_list, features)]
@@ -1,3 +1,7 @@
+import numpy as np
+import pandas as pd
+
+
 def join_df(left_df, right_df, left_on, right_on=None, suffix='_y'):
     """
     Join two DataFrame together with a left join
@@ -17,10 +21,134 @@ def join_df(left_df, right_df, left_on, right_on=None, suffix='_y'):
     return left_df.merge(right_df, how='left', left_on=left_on, right_on=right_on, suffixes=("", suffix))
 
 
+def _as_list(on):
+    return [on] if isinstance(on, str) else list(on)
+
+
+def _encode_keys(left_keys, right_keys):
+    """
+    Encode the (multi columns) keys of the left and right tables into int64 codes with a
+    hash table built on the right keys only. The left keys absent from the right table get -1.
+    Missing values are encoded as any other key, like DataFrame.merge() does.
+    Args:
+        left_keys (list): The key columns (arrays) of the left table
+        right_keys (list): The key columns (arrays) of the right table
+
+    Returns:
+        tuple: (left codes, right codes)
+    """
+    left_codes = np.zeros(len(left_keys[0]), dtype=np.int64)
+    right_codes = np.zeros(len(right_keys[0]), dtype=np.int64)
+    n_codes = 1
+    for left_key, right_key in zip(left_keys, right_keys):
+        codes, uniques = pd.factorize(right_key, use_na_sentinel=False)
+        left_key_codes = pd.Index(uniques).get_indexer(left_key)
+        # The missing right keys (None, NaN, NaT) are all factorized as NaN, the missing left keys get its code
+        na_codes = np.flatnonzero(pd.isnull(uniques))
+        if len(na_codes) > 0:
+            left_key_codes[pd.isnull(left_key)] = na_codes[0]
+        if n_codes * max(len(uniques), 1) >= 2 ** 62:
+            # Compress the codes so the combined codes can't overflow
+            right_codes, combined = pd.factorize(right_codes)
+            left_codes = np.where(left_codes < 0, -1, pd.Index(combined).get_indexer(left_codes))
+            n_codes = len(combined)
+        right_codes = right_codes * len(uniques) + codes
+        left_codes = np.where((left_codes < 0) | (left_key_codes < 0), -1, left_codes * len(uniques) + left_key_codes)
+        n_codes *= max(len(uniques), 1)
+    return left_codes, right_codes
+
+
+def _get_unique_indexer(left_keys, right_keys):
+    """
+    Returns the position of the right row matching each left row (or -1), or None if the right keys
+    are not unique
+    """
+    left_codes, right_codes = _encode_keys(left_keys, right_keys)
+    index = pd.Index(right_codes)
+    if not index.is_unique:
+        return None
+    return index.get_indexer(left_codes)
+
+
+def get_lookup_indexer(left_df, right_df, left_on, right_on=None):
+    """
+    Returns the position in right_df of the row matching each row of left_df on the keys, or -1
+    if there is none. right_df is a dimension table: its keys must be unique.
+    Args:
+        left_df (DataFrame): The DataFrame looking up the rows of right_df
+        right_df (DataFrame): The DataFrame with unique keys
+        left_on (str, list): The column name or a list of column names of left_df used for joining
+        right_on (str, list, None): The column name or a list of column names of right_df used for joining
+            or None if the column names are the same as left_on
+
+    Returns:
+        np.ndarray: The positions in right_df
+    """
+    left_on = _as_list(left_on)
+    right_on = left_on if right_on is None else _as_list(right_on)
+    indexer = _get_unique_indexer([np.asarray(left_df[col]) for col in left_on],
+                                  [np.asarray(right_df[col]) for col in right_on])
+    if indexer is None:
+        raise Exception("The keys {} of the right DataFrame are not unique, use join_df() instead".format(right_on))
+    return indexer
+
+
+def _lookup_columns(left_columns, right_df, indexer, left_on, right_on, suffix):
+    """
+    Gathers the columns of right_df at the indexer positions with a single take, the rows without
+    match get missing values (with the same dtype changes as DataFrame.merge()).
+    Returns a DataFrame with a RangeIndex and the right columns named as DataFrame.merge() does.
+    """
+    # Like merge() the right keys are only kept if they have another name than the left ones
+    cols = [col for col in right_df.columns if not (col in right_on and col in left_on)]
+    overlap = [col for col in cols if col in left_columns]
+    if suffix is None and len(overlap) > 0:
+        raise ValueError("columns overlap but no suffix specified: {}".format(overlap))
+    right = right_df[cols].reset_index(drop=True)
+    missing = indexer < 0
+    if missing.any():
+        right = right.reindex(np.arange(len(right) + 1))
+        indexer = np.where(missing, len(right) - 1, indexer)
+    res = right.take(indexer)
+    res.index = pd.RangeIndex(len(indexer))
+    if suffix is not None:
+        res.columns = [col + suffix if col in overlap else col for col in cols]
+    return res
+
+
+def lookup_join(left_df, right_df, left_on, right_on=None, suffix='_y'):
+    """
+    Left join a dimension table (a DataFrame with unique keys) to left_df.
+    Gives the same result as join_df() but the keys are encoded to int codes and looked up in an index
+    of the right keys, then all the right columns are gathered with a single take.
+    Raises an exception if the keys of right_df are not unique.
+    Args:
+        left_df (DataFrame): The DataFrame on which right_df will be merged
+        right_df (DataFrame): The DataFrame which will get merged into left_df, with unique keys
+        left_on (str, list): The column name or a list of column names of left_df used for joining
+        right_on (str, list, None): The column name or a list of column names of right_df used for joining
+            or None if the column names are the same as left_on
+        suffix (str, None): Suffix to apply the merged column name or None for no suffix
+
+    Returns:
+        DataFrame: The merged DataFrame
+    """
+    left_on = _as_list(left_on)
+    right_on = left_on if right_on is None else _as_list(right_on)
+    left = left_df.reset_index(drop=True)
+    indexer = get_lookup_indexer(left, right_df, left_on, right_on)
+    return pd.concat([left, _lookup_columns(list(left.columns), right_df, indexer, left_on, right_on, suffix)],
+                     axis=1)
+
+
 def join_mult_df(left_df: list, right_df: list, left_on, right_on=None, suffixes=None):
     """
     Merges Dataframes from from_df to on_df. This allow
-    for efficient merging of tables
+    for efficient merging of tables: the right_df with unique keys (dimension tables)
+    are looked up with an index of their keys (see lookup_join()) and the left DataFrames
+    are only copied once with all the looked up columns. The right_df with duplicated keys
+    are merged with join_df().
+    The keys of a right DataFrame can be columns brought by a previous right DataFrame.
 
     Args:
         left_df (list): List of DataFrames which will get metadata merged from from_df
@@ -28,8 +156,9 @@ def join_mult_df(left_df: list, right_df: list, left_on, right_on=None, suffixes
         left_on (list): The column names of left_df used for joining (must be in the same order as the passed df)
         right_on (list, None): The column names of right_df used for joining or None if the column
             names are the same as left_on (must be in the same order as the passed df)
-        suffixes (list):  List of suffix to apply to each merged column names
-            (must be in the same order as the passed df)
+        suffixes (list, None):  List of suffix to apply to each merged column names
+            (must be in the same order as the passed df). None for no suffix: the right columns
+            must then have other names than the left ones
 
         Example:
             join_mult_df([sales_df], [shops_df, items_df], ["shop_id", "item_id"])
@@ -44,15 +173,123 @@ def join_mult_df(left_df: list, right_df: list, left_on, right_on=None, suffixes
     rows_count = sum([df.shape[0] for df in left_df])
     res_df = [None] * len(left_df)
     for i, ldf in enumerate(left_df):
-        res_df[i] = ldf
+        left = ldf.reset_index(drop=True)
+        columns = list(left.columns)
+        looked_up = []
         for rdf, lon, ron, suffix in zip(right_df, left_on, right_on, suffixes):
-            res_df[i] = join_df(res_df[i], rdf, lon, ron, suffix)
+            lon = _as_list(lon)
+            ron = lon if ron is None else _as_list(ron)
+            left_keys = [np.asarray(next(df[col] for df in [left] + looked_up[::-1] if col in df.columns))
+                         for col in lon]
+            indexer = _get_unique_indexer(left_keys, [np.asarray(rdf[col]) for col in ron])
+            if indexer is None:
+                # Not a dimension table, the left rows can match several right rows
+                left = join_df(pd.concat([left] + looked_up, axis=1), rdf, lon, ron, suffix)
+                columns = list(left.columns)
+                looked_up = []
+                continue
+            cols = _lookup_columns(columns, rdf, indexer, lon, ron, suffix)
+            columns += list(cols.columns)
+            looked_up.append(cols)
+        res_df[i] = pd.concat([left] + looked_up, axis=1)
 
     # Ensure all df has the same number of row
     assert sum([df.shape[0] for df in res_df]) == rows_count, "Error: left_df size has changed during merging"
     return res_df
 
 
+def _to_sortable(values):
+    """
+    Returns the values of an "on" column as a numeric array and its missing values mask
+    """
+    values = np.asarray(values)
+    missing = pd.isnull(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype('datetime64[ns]').view(np.int64)
+    return values, missing
+
+
+def get_asof_indexer(left_df, right_df, on, by=None, tolerance=None, allow_exact_matches=True):
+    """
+    Returns the position in right_df of the last row (on the "on" column) of the same group preceding
+    each row of left_df, or -1 if there is none.
+    Both tables are sorted once by group and "on", then the rows of each group are matched with a
+    np.searchsorted() on the sorted arrays.
+    Args:
+        left_df (DataFrame): The DataFrame looking up the rows of right_df
+        right_df (DataFrame): The DataFrame to match
+        on (str): The column to match on, of type datetime64 or numeric, in both DataFrames
+        by (str, list, None): The column name or a list of column names of the groups, in both DataFrames
+        tolerance (pd.Timedelta, int, float, None): The maximum distance between the left and right "on" values
+        allow_exact_matches (bool): If False only the strictly preceding rows are matched
+
+    Returns:
+        np.ndarray: The positions in right_df
+    """
+    left_times, left_missing = _to_sortable(left_df[on])
+    right_times, right_missing = _to_sortable(right_df[on])
+    if by is not None:
+        by = _as_list(by)
+        left_codes, right_codes = _encode_keys([np.asarray(left_df[col]) for col in by],
+                                               [np.asarray(right_df[col]) for col in by])
+    else:
+        left_codes = np.zeros(left_df.shape[0], dtype=np.int64)
+        right_codes = np.zeros(right_df.shape[0], dtype=np.int64)
+    if tolerance is not None and np.issubdtype(np.asarray(left_df[on]).dtype, np.datetime64):
+        tolerance = pd.Timedelta(tolerance).value
+    left_codes = np.where(left_missing, -1, left_codes)
+
+    right_rows = np.nonzero(~right_missing)[0]
+    right_order = right_rows[np.lexsort((right_times[right_rows], right_codes[right_rows]))]
+    right_codes, right_times = right_codes[right_order], right_times[right_order]
+    left_order = np.argsort(left_codes, kind='stable')
+    left_codes, left_times = left_codes[left_order], left_times[left_order]
+
+    indexer = np.full(left_df.shape[0], -1, dtype=np.int64)
+    groups, left_starts = np.unique(left_codes, return_index=True)
+    left_ends = np.append(left_starts[1:], len(left_codes))
+    right_starts = np.searchsorted(right_codes, groups, side='left')
+    right_ends = np.searchsorted(right_codes, groups, side='right')
+    for group, ls, le, rs, re in zip(groups, left_starts, left_ends, right_starts, right_ends):
+        if group < 0 or rs == re:
+            continue
+        times = left_times[ls:le]
+        pos = np.searchsorted(right_times[rs:re], times, side='right' if allow_exact_matches else 'left') - 1
+        matched = pos >= 0
+        pos = rs + np.maximum(pos, 0)
+        if tolerance is not None:
+            matched &= times - right_times[pos] <= tolerance
+        indexer[left_order[ls:le][matched]] = right_order[pos[matched]]
+    return indexer
+
+
+def join_asof(left_df, right_df, on, by=None, tolerance=None, allow_exact_matches=True, suffix='_y'):
+    """
+    Left join right_df to left_df matching each row with the last row of right_df of the same group
+    whose "on" value is lower or equal (within the tolerance), e.g. daily sales with weekly trends.
+    Unlike pd.merge_asof() the DataFrames don't need to be sorted and the left_df order is kept.
+    See get_asof_indexer().
+    Args:
+        left_df (DataFrame): The DataFrame on which right_df will be merged
+        right_df (DataFrame): The DataFrame which will get merged into left_df
+        on (str): The column to match on, of type datetime64 or numeric, in both DataFrames
+        by (str, list, None): The column name or a list of column names of the groups, in both DataFrames
+        tolerance (pd.Timedelta, int, float, None): The maximum distance between the left and right "on" values
+        allow_exact_matches (bool): If False only the strictly preceding rows are matched
+        suffix (str, None): Suffix to apply the merged column name or None for no suffix
+
+    Returns:
+        DataFrame: The merged DataFrame
+    """
+    keys = [on] + (_as_list(by) if by is not None else [])
+    indexer = get_asof_indexer(left_df, right_df, on, by, tolerance, allow_exact_matches)
+    left = left_df.reset_index(drop=True)
+    cols = _lookup_columns(list(left.columns), right_df, indexer, keys, keys, suffix)
+    res = pd.concat([left, cols], axis=1)
+    assert res.shape[0] == left_df.shape[0], "Error: left_df size has changed during merging"
+    return res
+
+
 class CatSplit:
     def __init__(self, df_list):
         """
@@ -1,21 +1,653 @@
 """
 A structured data encoder based on sklearn API
 """
+import os
+import json
+import struct
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import scipy.sparse as sparse
+from scipy.special import erfinv
 from sklearn.base import BaseEstimator, TransformerMixin
-from sklearn.preprocessing import LabelEncoder, OneHotEncoder
-from category_encoders.one_hot import OneHotEncoder as CategOneHot
-from pandas.api.types import is_numeric_dtype
+from sklearn.preprocessing import StandardScaler, RobustScaler, MinMaxScaler, MaxAbsScaler
+from pandas.api.types import is_numeric_dtype, is_float_dtype
+from sklearn.utils import murmurhash3_32
+import torchlite.pandas.tools as tools
+
+
+def parallel_map(func, *iterables, n_jobs=1, use_processes=False):
+    """
+    Same as map() but the calls are made in a pool of threads or processes if n_jobs != 1.
+    The results are returned in the same order as the iterables.
+    Args:
+        func (callable): The function to apply. It must be defined at the module level if use_processes=True
+        *iterables (list): The iterables of arguments
+        n_jobs (int): Number of threads/processes, -1 to use all the CPUs
+        use_processes (bool): True to use a pool of processes, False for a pool of threads
+
+    Returns:
+        list: The results
+    """
+    args = list(zip(*iterables))
+    if n_jobs == 1 or len(args) <= 1:
+        return [func(*arg) for arg in args]
+    n_jobs = os.cpu_count() if n_jobs < 0 else n_jobs
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_cls(max_workers=min(n_jobs, len(args))) as executor:
+        return list(executor.map(func, *zip(*args)))
+
+
+def _has_missing(col):
+    return is_numeric_dtype(col) and bool(col.isnull().any())
+
+
+def _get_median(col):
+    return col.median() if _has_missing(col) else None
+
+
+def _fill_missing(col, value):
+    return col.isnull(), col.fillna(value)
+
+
+def _factorize_categories(col):
+    # Categories in order of appearance, NaN values are not a category
+    return pd.factorize(col)[1]
+
+
+def _get_categories(col):
+    return col.astype(pd.api.types.CategoricalDtype()).cat.categories
+
+
+def _to_codes(col, categories):
+    # "n/a" category will be encoded as 0
+    return col.astype(pd.api.types.CategoricalDtype(categories=categories, ordered=True)).cat.codes + 1
+
+
+def _smoothed_means(sums, counts, global_mean, smoothing):
+    # The categories with few samples are pulled toward the global mean
+    denom = counts + smoothing
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (sums + smoothing * global_mean) / denom
+    return np.where(denom > 0, means, global_mean)
+
+
+def _target_encoding(codes, categories, y, smoothing):
+    known = codes >= 0
+    sums = np.bincount(codes[known], weights=y[known], minlength=len(categories))
+    counts = np.bincount(codes[known], minlength=len(categories))
+    global_mean = y.mean()
+    return {"target": (global_mean, categories, _smoothed_means(sums, counts, global_mean, smoothing))}
+
+
+def _fit_target_encoding(col, y, smoothing):
+    # Mean/target/likelihood encoding
+    codes, categories = pd.factorize(col)
+    return _target_encoding(codes, categories, np.asarray(y, dtype=np.float64), smoothing)
+
+
+def _fit_target_out_of_fold(col, y, smoothing, n_folds):
+    """
+    Fit the target encoding and encode the training rows with out-of-fold means from the same codes
+    Returns:
+        tuple: The target encoding item and the encoded rows
+    """
+    codes, categories = pd.factorize(col)
+    y = np.asarray(y, dtype=np.float64)
+    return (_target_encoding(codes, categories, y, smoothing),
+            _target_out_of_fold(codes, len(categories), y, smoothing, n_folds))
+
+
+def _target_out_of_fold(codes, n_categories, y, smoothing, n_folds):
+    """
+    Target encoding of the training rows computed without their own target value: either
+    with the mean of the previous rows of the same category (expanding mean, n_folds=None)
+    or with the mean of the other folds (K-fold).
+    """
+    global_mean = y.mean()
+    res = np.full(len(y), global_mean)
+    rows = np.flatnonzero(codes >= 0)
+    codes, y_known = codes[rows], y[rows]
+
+    if n_folds is None:
+        order = np.argsort(codes, kind="stable")
+        sorted_codes, sorted_y = codes[order], y_known[order]
+        cumsum = np.cumsum(sorted_y) - sorted_y
+        group_starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, len(order)])
+        start_of_row = np.repeat(group_starts, group_sizes)
+        prev_sums = cumsum - cumsum[start_of_row]
+        prev_counts = np.arange(len(order)) - start_of_row
+        res[rows[order]] = _smoothed_means(prev_sums, prev_counts, global_mean, smoothing)
+    else:
+        # Deterministic assignment of the rows to the folds
+        folds = np.random.RandomState(0).permutation(len(rows)) % n_folds
+        keys = codes * n_folds + folds
+        fold_sums = np.bincount(keys, weights=y_known, minlength=n_categories * n_folds)
+        fold_counts = np.bincount(keys, minlength=n_categories * n_folds)
+        sums = fold_sums.reshape(-1, n_folds).sum(axis=1)[codes] - fold_sums[keys]
+        counts = fold_counts.reshape(-1, n_folds).sum(axis=1)[codes] - fold_counts[keys]
+        res[rows] = _smoothed_means(sums, counts, global_mean, smoothing)
+    return res
+
+
+def _hash_key(name, val):
+    # NaN and None give the same key. The numbers are hashed in a canonical form (1 and 1.0 give
+    # the same key) as the dtype of a column can change from a csv chunk or a record to another
+    if val is None or val != val:
+        val = "nan"
+    elif isinstance(val, (float, np.floating)):
+        val = int(val) if float(val).is_integer() else repr(float(val))
+    elif isinstance(val, np.integer):
+        val = int(val)
+    return "{}={}".format(name, val)
+
+
+def _hash_keys(keys, hash_space, seed):
+    """
+    Hash string keys with MurmurHash3 which, unlike hash(), gives the same values in every process
+    Returns:
+        tuple: The buckets in [0, hash_space) and the signs (+1/-1) of the hashes
+    """
+    hashs = np.array([murmurhash3_32(key, seed=seed) for key in keys], dtype=np.int64)
+    return np.abs(hashs) % hash_space, np.where(hashs >= 0, 1., -1.)
+
+
+def _hash_column(col, hash_space, seed):
+    # Only the unique values are hashed, the rows get the hash of their value through its code
+    codes, uniques = pd.factorize(col)
+    keys = [_hash_key(col.name, val) for val in uniques] + [_hash_key(col.name, None)]
+    buckets, signs = _hash_keys(keys, hash_space, seed)
+    # Missing values have the code -1, the last key
+    return buckets[codes], signs[codes]
+
+
+def _onehot_columns(name, categories):
+    # The category i (in order of appearance) gets the column name_{i + 1}, unknown and missing values name_-1
+    return ["{}_{}".format(name, i + 1) for i in range(len(categories))] + ["{}_-1".format(name)]
+
+
+def _transform_linear_categ(col, item):
+    method = next(iter(item.keys()))
+    if method == "target":
+        # BE CAREFUL of the following points:
+        # • Local experiments:
+        #   ‒ Estimate encodings on X_train
+        #   ‒ Map them to X_train and X_val
+        #   ‒ Regularize on X_train
+        #   ‒ Validate the model on X_train / X_val split
+        # • Submission:
+        #   ‒ Estimate encodings on whole Train data
+        #   ‒ Map them to Train and Test
+        #   ‒ Regularize on Train
+        #   ‒ Fit on Train
+        global_mean, categories, means = item["target"]
+        # Unknown categories (index -1) get the global mean
+        return np.append(means, global_mean)[categories.get_indexer(col)]
+    elif method == "hashing":
+        hash_space, seed = item["hashing"]
+        return _hash_column(col, hash_space, seed)[0]
+    elif method == "onehot":
+        # Offset of the indicator of each row, the last one for unknown and missing values
+        categories = item["onehot"]
+        codes = categories.get_indexer(col)
+        return np.where(codes < 0, len(categories), codes)
+
+
+class QuantileSketch:
+    def __init__(self, max_size=10000):
+        """
+        A mergeable summary of a distribution used to compute quantiles in one pass over chunks
+        of data. The distinct values and their counts are kept exactly until there are more than
+        max_size of them, then adjacent values are merged into max_size weighted centroids.
+        The quantiles are exact as long as the number of distinct values stays below max_size,
+        otherwise their rank error is about count / max_size.
+        Args:
+            max_size (int): Maximum number of (value, weight) pairs kept
+        """
+        self.max_size = max_size
+        self.values = np.empty(0)
+        self.weights = np.empty(0)
+
+    @property
+    def count(self):
+        return self.weights.sum()
+
+    def update(self, values, weights=None):
+        """
+        Add values to the sketch, NaN values are ignored
+        Args:
+            values (np.ndarray): The values
+            weights (np.ndarray, None): The weight (number of occurrences) of each value
+
+        Returns:
+            QuantileSketch: self
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+        not_null = ~np.isnan(values)
+        values, inverse = np.unique(np.concatenate([self.values, values[not_null]]), return_inverse=True)
+        weights = np.bincount(inverse.ravel(), weights=np.concatenate([self.weights, weights[not_null]]),
+                              minlength=len(values))
+        if len(values) > self.max_size:
+            # Merge adjacent values holding about the same total weight
+            rank = np.cumsum(weights) - weights
+            buckets = (rank / weights.sum() * self.max_size).astype(np.int64)
+            bucket_weights = np.bincount(buckets, weights=weights)
+            bucket_values = np.bincount(buckets, weights=values * weights)
+            kept = bucket_weights > 0
+            values, weights = bucket_values[kept] / bucket_weights[kept], bucket_weights[kept]
+        self.values, self.weights = values, weights
+        return self
+
+    def merge(self, other):
+        return self.update(other.values, other.weights)
+
+    def copy(self):
+        sketch = QuantileSketch(self.max_size)
+        sketch.values, sketch.weights = self.values.copy(), self.weights.copy()
+        return sketch
+
+    def quantile(self, q):
+        """
+        Returns the q quantile with the linear interpolation of np.percentile()/pd.Series.quantile()
+        Args:
+            q (float, np.ndarray): The quantile(s) in [0, 1]
+
+        Returns:
+            float, np.ndarray: The quantile(s), NaN if the sketch is empty
+        """
+        if len(self.values) == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        cum_weights = np.cumsum(self.weights)
+        pos = np.asarray(q, dtype=np.float64) * (cum_weights[-1] - 1)
+        lower, upper = np.floor(pos), np.ceil(pos)
+        last = len(self.values) - 1
+        lower_values = self.values[np.minimum(np.searchsorted(cum_weights, lower, side="right"), last)]
+        upper_values = self.values[np.minimum(np.searchsorted(cum_weights, upper, side="right"), last)]
+        return lower_values + (pos - lower) * (upper_values - lower_values)
+
+
+def _get_moments(values):
+    # (count, mean, sum of squared deviations, min, max)
+    if len(values) == 0:
+        return 0, 0., 0., np.inf, -np.inf
+    mean = values.mean()
+    return len(values), mean, ((values - mean) ** 2).sum(), values.min(), values.max()
+
+
+def _merge_moments(a, b):
+    # Chan et al. parallel algorithm
+    n = a[0] + b[0]
+    if a[0] == 0 or b[0] == 0:
+        return b if a[0] == 0 else a
+    delta = b[1] - a[1]
+    mean = a[1] + delta * b[0] / n
+    m2 = a[2] + b[2] + delta ** 2 * a[0] * b[0] / n
+    return n, mean, m2, min(a[3], b[3]), max(a[4], b[4])
+
+
+class ColumnStats:
+    def __init__(self, is_numeric):
+        """
+        Mergeable statistics of a column used to fit the encoders incrementally:
+        missing values count, moments and quantile sketch of numeric columns, categories
+        in order of appearance and target sums/counts per category of categorical columns.
+        Use _get_column_stats() to compute them on a chunk.
+        """
+        self.is_numeric = is_numeric
+        self.n_missing = 0
+        self.moments = _get_moments([])
+        self.sketch = QuantileSketch()
+        self.categories = None
+        # Number of categories seen before the first missing value
+        self.first_nan_pos = None
+        self.y_sums = None
+        self.y_counts = None
+        self.y_nan_sum = 0.
+        self.y_nan_count = 0
+
+    def merge(self, other):
+        """
+        Merge the statistics of the next chunk. The categories of other which are
+        not known yet are appended so the existing codes don't change.
+        Args:
+            other (ColumnStats): The statistics of the next chunk
+
+        Returns:
+            ColumnStats: self
+        """
+        self.is_numeric = self.is_numeric and other.is_numeric
+        self.n_missing += other.n_missing
+        self.moments = _merge_moments(self.moments, other.moments)
+        self.sketch.merge(other.sketch)
+        if self.categories is None:
+            return self
+
+        idx = self.categories.get_indexer(other.categories)
+        is_new = idx < 0
+        if self.first_nan_pos is None and other.first_nan_pos is not None:
+            self.first_nan_pos = len(self.categories) + int(is_new[:other.first_nan_pos].sum())
+        idx[is_new] = len(self.categories) + np.arange(is_new.sum())
+        if self.y_sums is not None and other.y_sums is not None:
+            n_categories = len(self.categories) + int(is_new.sum())
+            self.y_sums = np.concatenate([self.y_sums, np.zeros(n_categories - len(self.y_sums))])
+            self.y_counts = np.concatenate([self.y_counts, np.zeros(n_categories - len(self.y_counts))])
+            self.y_sums[idx] += other.y_sums
+            self.y_counts[idx] += other.y_counts
+            self.y_nan_sum += other.y_nan_sum
+            self.y_nan_count += other.y_nan_count
+        else:
+            self.y_sums, self.y_counts = None, None
+        self.categories = self.categories.append(other.categories[is_new])
+        return self
+
+    def get_categories(self, fill_value=None):
+        """
+        Returns the categories, with fill_value at the place it would have if the missing
+        values were replaced by fill_value before computing the categories
+        Args:
+            fill_value (object, None): The value replacing the missing values, None if they are not replaced
+
+        Returns:
+            tuple: The categories (pd.Index), the target sums and counts per category (None if not computed)
+        """
+        categories, sums, counts = self.categories, self.y_sums, self.y_counts
+        if fill_value is None or self.first_nan_pos is None:
+            return categories, sums, counts
+
+        pos = self.first_nan_pos
+        i = categories.get_indexer([fill_value])[0]
+        nan_sum, nan_count = self.y_nan_sum, self.y_nan_count
+        if 0 <= i < pos:
+            # The value appeared before the first missing value, it keeps its place
+            if sums is not None:
+                sums, counts = sums.copy(), counts.copy()
+                sums[i] += nan_sum
+                counts[i] += nan_count
+            return categories, sums, counts
+        if i >= 0:
+            categories = categories.delete(i)
+            if sums is not None:
+                nan_sum, nan_count = nan_sum + sums[i], nan_count + counts[i]
+                sums, counts = np.delete(sums, i), np.delete(counts, i)
+        categories = categories.insert(pos, fill_value)
+        if sums is not None:
+            sums, counts = np.insert(sums, pos, nan_sum), np.insert(counts, pos, nan_count)
+        return categories, sums, counts
+
+    def get_filled_moments(self, fill_value):
+        if fill_value is None or self.n_missing == 0:
+            return self.moments
+        fill_value = float(np.float32(fill_value))
+        return _merge_moments(self.moments, (self.n_missing, fill_value, 0., fill_value, fill_value))
+
+    def get_filled_sketch(self, fill_value):
+        # The scalers are fitted on float32 values, casting the sketch values merges the same ones
+        sketch = QuantileSketch(self.sketch.max_size)
+        sketch.update(self.sketch.values.astype(np.float32), self.sketch.weights)
+        if fill_value is not None and self.n_missing > 0:
+            sketch.update([np.float32(fill_value)], [self.n_missing])
+        return sketch
+
+
+def _get_column_stats(col, is_categ, y):
+    stats = ColumnStats(is_numeric_dtype(col))
+    is_null = col.isnull().values
+    stats.n_missing = int(is_null.sum())
+    if stats.is_numeric:
+        values = col.values[~is_null]
+        # The scalers are fitted on float32 values
+        stats.moments = _get_moments(values.astype(np.float32).astype(np.float64))
+        stats.sketch.update(values.astype(np.float64))
+    if is_categ:
+        codes, uniques = pd.factorize(col)
+        stats.categories = pd.Index(uniques)
+        if stats.n_missing > 0:
+            first_nan = int(np.argmax(is_null))
+            stats.first_nan_pos = int(codes[:first_nan].max()) + 1 if first_nan > 0 else 0
+        if y is not None:
+            y = np.asarray(y, dtype=np.float64)
+            known = codes >= 0
+            stats.y_sums = np.bincount(codes[known], weights=y[known], minlength=len(uniques))
+            stats.y_counts = np.bincount(codes[known], minlength=len(uniques)).astype(np.float64)
+            stats.y_nan_sum = y[is_null].sum()
+            stats.y_nan_count = stats.n_missing
+    return stats
+
+
+def _get_file_stats(encoder, path, y, chunksize, read_csv_kwargs):
+    stats = None
+    for chunk in tools.read_chunks(path, chunksize, **read_csv_kwargs):
+        # An empty csv still gives a chunk, without rows its columns don't even have their dtypes
+        if chunk.shape[0] == 0:
+            continue
+        chunk_stats = encoder.get_stats(chunk, y)
+        stats = chunk_stats if stats is None else stats.merge(chunk_stats)
+    return stats
+
+
+class EncoderStats:
+    def __init__(self, columns, template, y_sum=0., y_count=0):
+        """
+        The mergeable statistics of the chunks seen by BaseEncoder.partial_fit()
+        Args:
+            columns (dict): Column name -> ColumnStats
+            template (pd.DataFrame): An empty DataFrame with the columns and dtypes of the features
+            y_sum (float): Sum of the target values
+            y_count (int): Number of target values
+        """
+        self.columns = columns
+        self.template = template
+        self.y_sum = y_sum
+        self.y_count = y_count
+
+    def merge(self, other):
+        """
+        Merge the statistics of the next chunk(s)
+        Args:
+            other (EncoderStats): The statistics to merge
+
+        Returns:
+            EncoderStats: self
+        """
+        for col, col_stats in other.columns.items():
+            if col in self.columns:
+                self.columns[col].merge(col_stats)
+            else:
+                self.columns[col] = col_stats
+        self.y_sum += other.y_sum
+        self.y_count += other.y_count
+        return self
+
+
+def _fit_scaler_from_stats(scaler, moments, sketches):
+    """
+    Set the fitted attributes of an sklearn scaler from the moments/sketches of its columns
+    """
+    n_features = len(moments)
+    count, mean, m2, data_min, data_max = [np.array(v, dtype=np.float64) for v in zip(*moments)] \
+        if n_features > 0 else [np.empty(0)] * 5
+    if isinstance(scaler, StandardScaler):
+        scaler.mean_ = mean if scaler.with_mean else None
+        scaler.var_ = m2 / np.maximum(count, 1) if scaler.with_std else None
+        scaler.scale_ = _handle_zeros(np.sqrt(scaler.var_)) if scaler.with_std else None
+    elif isinstance(scaler, MinMaxScaler):
+        feature_min, feature_max = scaler.feature_range
+        scaler.data_min_, scaler.data_max_ = data_min, data_max
+        scaler.data_range_ = data_max - data_min
+        scaler.scale_ = (feature_max - feature_min) / _handle_zeros(scaler.data_range_)
+        scaler.min_ = feature_min - data_min * scaler.scale_
+    elif isinstance(scaler, MaxAbsScaler):
+        scaler.max_abs_ = np.maximum(np.abs(data_min), np.abs(data_max))
+        scaler.scale_ = _handle_zeros(scaler.max_abs_)
+    elif isinstance(scaler, RobustScaler):
+        if getattr(scaler, "unit_variance", False):
+            raise NotImplementedError("RobustScaler(unit_variance=True) cannot be fitted incrementally")
+        q_min, q_max = scaler.quantile_range
+        scaler.center_ = np.array([sketch.quantile(0.5) for sketch in sketches]) if scaler.with_centering else None
+        scaler.scale_ = _handle_zeros(np.array([sketch.quantile(q_max / 100.) - sketch.quantile(q_min / 100.)
+                                                for sketch in sketches])) if scaler.with_scaling else None
+    elif isinstance(scaler, RankGaussScaler):
+        scaler._fit_from_sketches([sketch.copy() for sketch in sketches])
+    else:
+        raise NotImplementedError("Scaler {} cannot be fitted incrementally".format(type(scaler).__name__))
+    scaler.n_samples_seen_ = int(count.max()) if n_features > 0 else 0
+    scaler.n_features_in_ = n_features
+
+
+def _handle_zeros(scale):
+    # Same as sklearn: constant features are not scaled
+    scale = np.array(scale, dtype=np.float64)
+    scale[scale == 0.] = 1.
+    return scale
+
+
+def _rank_gauss(x, quantiles):
+    references = np.linspace(0, 1, len(quantiles))
+    # Mean of the interpolations from both sides to give the middle rank to the tied quantiles
+    ranks = 0.5 * (np.interp(x, quantiles, references) - np.interp(-x, -quantiles[::-1], -references[::-1]))
+    ranks = np.clip(ranks, 1e-7, 1 - 1e-7)
+    return np.sqrt(2) * erfinv(2 * ranks - 1)
+
+
+class RankGaussScaler(BaseEstimator, TransformerMixin):
+    def __init__(self, n_quantiles=1000, max_size=10000):
+        """
+        A scaler mapping the values to their rank then to a standard normal distribution with the
+        inverse error function, which is robust to outliers and skewed distributions.
+        Reference -> https://www.kaggle.com/c/porto-seguro-safe-driver-prediction/discussion/44629
+        The ranks are interpolated from quantiles estimated with a QuantileSketch per column, so
+        the scaler can be fitted in one streaming pass with partial_fit() and the scalers fitted on
+        different partitions can be merged with merge(). NaN values stay NaN.
+        Args:
+            n_quantiles (int): Number of quantiles used to interpolate the ranks
+            max_size (int): The max_size of the QuantileSketch of each column
+        """
+        self.n_quantiles = n_quantiles
+        self.max_size = max_size
+        self.sketches = None
+
+    def _fit_from_sketches(self, sketches):
+        self.sketches = sketches
+        references = np.linspace(0, 1, self.n_quantiles)
+        self.quantiles_ = np.column_stack([sketch.quantile(references) for sketch in sketches]) \
+            if len(sketches) > 0 else np.empty((self.n_quantiles, 0))
+        self.n_features_in_ = len(sketches)
+        return self
+
+    def partial_fit(self, X, y=None):
+        """
+        Update the quantiles with a chunk of data
+        Args:
+            X (np.ndarray): Array of shape [n_samples, n_features]
+
+        Returns:
+            RankGaussScaler: self
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        if self.sketches is None:
+            self.sketches = [QuantileSketch(self.max_size) for _ in range(X.shape[1])]
+        for sketch, col in zip(self.sketches, X.T):
+            sketch.update(col)
+        return self._fit_from_sketches(self.sketches)
+
+    def fit(self, X, y=None):
+        self.sketches = None
+        return self.partial_fit(X)
+
+    def merge(self, other):
+        """
+        Merge the quantile sketches of a scaler fitted on other data
+        Args:
+            other (RankGaussScaler): A fitted scaler with the same features
+
+        Returns:
+            RankGaussScaler: self
+        """
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+        return self._fit_from_sketches(self.sketches)
+
+    def transform(self, X):
+        X = np.asarray(X)
+        res = np.empty(X.shape, dtype=X.dtype if X.dtype.kind == "f" else np.float64)
+        for i in range(X.shape[1]):
+            res[:, i] = _rank_gauss(X[:, i], self.quantiles_[:, i])
+        return res
+
+
+def _get_scaler_ops(scaler):
+    """
+    Returns the sequence of in-place operations applied by a fitted sklearn scaler
+    in its transform() method, as a list of (operation, coefficients) tuples.
+    """
+    if isinstance(scaler, StandardScaler):
+        ops = ([("sub", scaler.mean_)] if scaler.with_mean else []) + \
+              ([("div", scaler.scale_)] if scaler.with_std else [])
+    elif isinstance(scaler, RobustScaler):
+        ops = ([("sub", scaler.center_)] if scaler.with_centering else []) + \
+              ([("div", scaler.scale_)] if scaler.with_scaling else [])
+    elif isinstance(scaler, MinMaxScaler):
+        ops = [("mul", scaler.scale_), ("add", scaler.min_)]
+        if getattr(scaler, "clip", False):
+            ops.append(("clip", np.array(scaler.feature_range, dtype=np.float64)))
+    elif isinstance(scaler, MaxAbsScaler):
+        ops = [("div", scaler.scale_)]
+    elif isinstance(scaler, RankGaussScaler):
+        ops = [("rankgauss", scaler.quantiles_)]
+    else:
+        raise NotImplementedError("Scaler {} cannot be compiled".format(type(scaler).__name__))
+
+    # Depending on the sklearn version the coefficients are cast to the dtype of the data (float32)
+    # or not before the operations, keep the variant giving the same values as the scaler
+    probe = np.random.RandomState(0).randn(256, scaler.n_features_in_).astype(np.float32) * 100
+    expected = scaler.transform(probe)
+    for dtype in (np.float64, np.float32):
+        cast_ops = [(op, np.asarray(coefs, dtype=dtype)) for op, coefs in ops]
+        if np.array_equal(_apply_scaler_ops(probe.copy(), cast_ops), expected):
+            return cast_ops
+    raise Exception("The compiled operations of {} don't give the same values as its transform()"
+                    .format(type(scaler).__name__))
+
+
+def _apply_scaler_ops(X, ops):
+    for op, coefs in ops:
+        if op == "sub":
+            X -= coefs
+        elif op == "div":
+            X /= coefs
+        elif op == "mul":
+            X *= coefs
+        elif op == "add":
+            X += coefs
+        elif op == "clip":
+            np.clip(X, coefs[0], coefs[1], out=X)
+        elif op == "rankgauss":
+            for i in range(X.shape[1]):
+                X[:, i] = _rank_gauss(X[:, i], coefs[:, i])
+    return X
 
 
 class BaseEncoder(BaseEstimator, TransformerMixin):
-    def __init__(self, numeric_vars, categorical_vars, fix_missing, numeric_scaler):
+    def __init__(self, numeric_vars, categorical_vars, fix_missing, numeric_scaler, n_jobs=1, use_processes=False,
+                 keep_stats=False):
         self.categorical_vars = categorical_vars
         self.numeric_vars = numeric_vars
         self.tfs_list = {}
         self.numeric_scaler = numeric_scaler
         self.fix_missing = fix_missing
+        self.n_jobs = n_jobs
+        self.use_processes = use_processes
+        self.keep_stats = keep_stats
+        self.stats = None
+
+    def _map_columns(self, func, *iterables):
+        """
+        Apply func to independent columns with the n_jobs of the encoder
+        """
+        return parallel_map(func, *iterables, n_jobs=self.n_jobs, use_processes=self.use_processes)
 
     def _get_all_non_numeric(self, df):
         non_num_cols = []
@@ -53,6 +685,59 @@ class BaseEncoder(BaseEstimator, TransformerMixin):
     def _perform_categ_transform(self, df):
         raise NotImplementedError()
 
+    def _perform_categ_fit_transform(self, df, y, out_of_fold):
+        """
+        Fit the categorical encoding and transform df. out_of_fold is True when called by
+        fit_transform() so the encoders can encode the training rows differently.
+        """
+        self._perform_categ_fit(df, y)
+        return self._perform_categ_transform(df)
+
+    def _stats_na_fit(self, stats):
+        raise NotImplementedError()
+
+    def _stats_categ_fit(self, stats):
+        raise NotImplementedError()
+
+    def _compile_fill(self):
+        raise NotImplementedError()
+
+    def _compile_categ(self):
+        raise NotImplementedError()
+
+    def _compile_hashing(self):
+        return {}
+
+    def _compile_onehot(self):
+        return {}
+
+    def compile(self):
+        """
+        Compile the fitted encoder into a frozen EncoderPlan which transforms NumPy arrays
+        or dict records without pandas and gives the same values as transform().
+        Returns:
+            EncoderPlan: The compiled plan
+        """
+        if "cols" not in self.tfs_list:
+            raise Exception("The encoder must be fitted before being compiled")
+        all_feat = self.categorical_vars + self.numeric_vars
+        categ = self._compile_categ()
+        onehot = self._compile_onehot()
+        input_cols = [feat for feat in all_feat if feat in self.tfs_list["cols"] or feat in categ or feat in onehot]
+        fill = self._compile_fill() if self.fix_missing else {}
+        scale_ops = _get_scaler_ops(self.numeric_scaler) if self.numeric_scaler is not None else []
+        return EncoderPlan(input_cols, list(self.tfs_list["cols"]), fill, categ,
+                           list(self.tfs_list["num_cols"]), scale_ops, self._compile_hashing(), onehot)
+
+    def save(self, path):
+        """
+        Save what the transformation needs to a single .npz file which can be loaded
+        with EncoderPlan.load(). See EncoderPlan.save().
+        Args:
+            path (str): The .npz file path
+        """
+        self.compile().save(path)
+
     def fit(self, X, y=None, **kwargs):
         """
         Fit encoder according to X and y.
@@ -73,20 +758,27 @@ class BaseEncoder(BaseEstimator, TransformerMixin):
             self : encoder
                 Returns self.
         """
+        self._fit(X, y)
+        return self
+
+    def _fit(self, X, y, out_of_fold=False):
+        """
+        Fit the encoder and return X with the missing values fixed and the categories encoded
+        (not scaled), see fit()
+        """
         all_feat = self.categorical_vars + self.numeric_vars
         df = X[[feat for feat in all_feat if feat in X.columns]].copy()
-        if y is not None:
-            self.tfs_list["y"] = X[y]
+        # The target is only used during the fit, it's not kept in tfs_list
+        target = X[y] if y is not None else None
 
         # Missing values
         if self.fix_missing:
-            self._perform_na_fit(df, y)
+            self._perform_na_fit(df, target)
             df = self._perform_na_transform(df)
 
         # Categorical columns
         # http://contrib.scikit-learn.org/categorical-encoding/
-        self._perform_categ_fit(df, y)
-        df = self._perform_categ_transform(df)
+        df = self._perform_categ_fit_transform(df, target, out_of_fold)
 
         # Scaling
         num_cols = [n for n in df.columns if is_numeric_dtype(df[n]) and n in self.numeric_vars]
@@ -96,59 +788,517 @@ class BaseEncoder(BaseEstimator, TransformerMixin):
             self.numeric_scaler.fit(df[num_cols].astype(np.float32).values)
 
         self.tfs_list["cols"] = df.columns
-        del df
+        # The statistics of X are only computed if partial_fit() has to add new chunks to them
+        self.stats = self.get_stats(X, y) if self.keep_stats else None
+        return df
+
+    def get_stats(self, X, y=None):
+        """
+        Compute the mergeable statistics of a chunk of data, see partial_fit()
+        Args:
+            X (pd.DataFrame): A chunk of data
+            y (str, None): Column name of the target value of X
+
+        Returns:
+            EncoderStats: The statistics of the chunk
+        """
+        all_feat = self.categorical_vars + self.numeric_vars
+        feats = [feat for feat in all_feat if feat in X.columns]
+        target = X[y] if y is not None else None
+        col_stats = self._map_columns(_get_column_stats, [X[feat] for feat in feats],
+                                      [feat in self.categorical_vars for feat in feats], [target] * len(feats))
+        return EncoderStats(dict(zip(feats, col_stats)), X[feats].iloc[:0].copy(),
+                            float(target.sum()) if target is not None else 0.,
+                            len(target) if target is not None else 0)
+
+    def partial_fit(self, X, y=None):
+        """
+        Fit the encoder incrementally: the statistics of X are merged with the ones of
+        the chunks passed in the previous calls and the encoder is refitted from them, so the
+        cost only depends on the size of X. No data or target is retained.
+            - The categories are append-only: the categories of the previous chunks keep their codes
+              and the new ones are added after them.
+            - The medians come from a QuantileSketch. They are exact while the columns have less
+              than QuantileSketch.max_size distinct values and approximated otherwise.
+            - The scalers (StandardScaler, MinMaxScaler, MaxAbsScaler, RobustScaler) are fitted from
+              the merged moments/sketches, including the filled missing values.
+            - The target encoding uses the merged target sums and counts per category.
+        Fitting all the chunks in their original order gives the same categories as fit()
+        on the concatenated DataFrame. If the encoder was created with keep_stats=True the statistics
+        of the fit() data are kept so partial_fit() extends the fitted encoder (e.g. fit the history
+        then partial_fit each day) and the existing categories keep their codes. Otherwise partial_fit()
+        after fit() starts from the new chunk only.
+        Args:
+            X (pd.DataFrame): A chunk of data
+            y (str, None): Column name of the target value of X
+
+        Returns:
+            self: The encoder
+        """
+        return self.fit_from_stats(self.get_stats(X, y))
+
+    def fit_from_stats(self, stats):
+        """
+        Merge the statistics with the ones already seen by partial_fit() and fit the encoder
+        Args:
+            stats (EncoderStats): Statistics computed with get_stats()
+
+        Returns:
+            self: The encoder
+        """
+        self.stats = stats if self.stats is None else self.stats.merge(stats)
+        stats = self.stats
+        if self.fix_missing:
+            self._stats_na_fit(stats)
+        self._stats_categ_fit(stats)
+
+        # The transformed columns are given by the transformation of an empty DataFrame
+        df = stats.template.copy()
+        if self.fix_missing:
+            df = self._perform_na_transform(df)
+        df = self._perform_categ_transform(df)
+
+        num_cols = [n for n in df.columns if is_numeric_dtype(df[n]) and n in self.numeric_vars]
+        self.tfs_list["num_cols"] = num_cols
+        if self.numeric_scaler is not None:
+            fill_values = {col: value for col, (value, _) in self._compile_fill().items()} if self.fix_missing else {}
+            col_stats = [(stats.columns[col], fill_values.get(col)) for col in num_cols]
+            sketches = [s.get_filled_sketch(fill) for s, fill in col_stats] \
+                if isinstance(self.numeric_scaler, (RobustScaler, RankGaussScaler)) else []
+            _fit_scaler_from_stats(self.numeric_scaler, [s.get_filled_moments(fill) for s, fill in col_stats],
+                                   sketches)
+        self.tfs_list["cols"] = df.columns
         return self
 
-    def transform(self, X):
+    def fit_partitions(self, paths, y=None, n_jobs=-1, chunksize=1000000, read_csv_kwargs=None):
         """
-        Perform the transformation to new data.
-        X (pd.DataFrame): Array of DataFrame of shape = [n_samples, n_features]
-                Training vectors, where n_samples is the number of samples
-                and n_features is the number of features.
+        Fit the encoder on a dataset split in several .csv/.feather files without concatenating them.
+        The statistics of each partition (see partial_fit()) are computed chunk by chunk in a pool of
+        processes then merged in the order of the paths.
+        The result is the same as fit() on the concatenated partitions except for:
+            - The medians (and RobustScaler quantiles) of the columns with more than QuantileSketch.max_size
+              distinct values which have a rank error of about n_rows / QuantileSketch.max_size
+            - The float rounding of the scalers moments and of the target means
+        Args:
+            paths (list): The .csv or .feather files, the empty ones are skipped
+            y (str, None): Column name of the target value in the files
+            n_jobs (int): Number of processes, -1 to use all the CPUs
+            chunksize (int): Maximum number of rows read at once from a file
+            read_csv_kwargs (dict, None): Arguments passed to pd.read_csv() for the csv files
 
         Returns:
+            self: The encoder
+        """
+        if len(paths) == 0:
+            raise ValueError("fit_partitions() needs at least one partition path")
+        # The workers get a copy of the encoder computing the statistics in their own process only
+        n_jobs_per_column, self.n_jobs = self.n_jobs, 1
+        try:
+            all_stats = parallel_map(_get_file_stats, [self] * len(paths), paths, [y] * len(paths),
+                                     [chunksize] * len(paths), [read_csv_kwargs or {}] * len(paths),
+                                     n_jobs=n_jobs, use_processes=True)
+        finally:
+            self.n_jobs = n_jobs_per_column
+
+        # The empty partitions have no statistics
+        all_stats = [partition_stats for partition_stats in all_stats if partition_stats is not None]
+        if len(all_stats) == 0:
+            raise ValueError("All the partitions are empty: {}".format(paths))
+        stats = all_stats[0]
+        for partition_stats in all_stats[1:]:
+            stats.merge(partition_stats)
+        self.stats = None
+        return self.fit_from_stats(stats)
 
+    def _transform(self, X):
+        """
+        Apply the fitted transformations to X without any check or print
         """
         all_feat = self.categorical_vars + self.numeric_vars
-        missing_col = [col for col in X.columns if col not in all_feat]
         df = X[[feat for feat in all_feat if feat in X.columns]].copy()
 
         if self.fix_missing:
-            print("Warning: Missing columns: {}, dropping them...".format(missing_col))
-            print("--- Fixing NA values ({}) ---".format(len(self.tfs_list["missing"])))
             df = self._perform_na_transform(df)
-            print("List of NA columns fixed: {}".format(list(self.tfs_list["missing"])))
-            print("Categorizing features {}".format(self.categorical_vars))
 
         # Categorical columns
         df = self._perform_categ_transform(df)
+        return self._scale(df)
 
-        # Scaling
+    def _scale(self, df):
         if self.numeric_scaler is not None:
             num_cols = self.tfs_list["num_cols"]
             # Turning all the columns to the same dtype before scaling is important
             df[num_cols] = self.numeric_scaler.transform(df[num_cols].astype(np.float32).values)
-            print("List of scaled columns: {}".format(num_cols))
+        return df
 
-        # Print stats
+    def _check_transformed(self, df, summary):
         non_num_cols = self._get_all_non_numeric(df)
-        nan_ratio = df.isnull().sum() / len(df)
-
-        print("------- Dataframe of len {} summary -------\n".format(len(df.columns)))
-        for col, nan, dtype in zip(df.columns, nan_ratio.values, df.dtypes.values):
-            print("Column {:<30}:\t dtype: {:<10}\t NaN ratio: {}".format(col, str(dtype), nan))
         if len(non_num_cols) > 0:
             raise Exception("Not all columns are numeric: {}.".format(non_num_cols))
-        if self.fix_missing and nan_ratio.all() > 0:
+        if self.fix_missing and summary.nan_ratio.all() > 0:
             raise Exception("NaN has been found!")
-
         self._check_integrity(df)
-        print("---------- Preprocessing done -----------")
+
+    def transform(self, X, verbose=True):
+        """
+        Perform the transformation to new data.
+        X (pd.DataFrame): Array of DataFrame of shape = [n_samples, n_features]
+                Training vectors, where n_samples is the number of samples
+                and n_features is the number of features.
+        verbose (bool): If True prints the transformations and a summary of the resulting DataFrame
+
+        Returns:
+            pd.DataFrame: The transformed DataFrame
+        """
+        self._print_transform(X, verbose)
+        return self._summarize(self._transform(X), verbose)
+
+    def _print_transform(self, X, verbose):
+        if verbose:
+            all_feat = self.categorical_vars + self.numeric_vars
+            missing_col = [col for col in X.columns if col not in all_feat]
+            if self.fix_missing:
+                print("Warning: Missing columns: {}, dropping them...".format(missing_col))
+                print("--- Fixing NA values ({}) ---".format(len(self.tfs_list["missing"])))
+                print("List of NA columns fixed: {}".format(list(self.tfs_list["missing"])))
+                print("Categorizing features {}".format(self.categorical_vars))
+            if self.numeric_scaler is not None:
+                print("List of scaled columns: {}".format(self.tfs_list["num_cols"]))
+
+    def _summarize(self, df, verbose):
+        summary = TransformSummary()
+        summary.update(df)
+        if verbose:
+            summary.print()
+        self._check_transformed(df, summary)
+        if verbose:
+            print("---------- Preprocessing done -----------")
         return df
 
+    def transform_to(self, X, to_path, chunksize=100000, file_format="feather", read_csv_kwargs=None):
+        """
+        Perform the transformation chunk by chunk and write the result incrementally
+        to disk so large datasets can be transformed in bounded memory.
+        The float columns are written as float32.
+        Args:
+            X (pd.DataFrame, str): A DataFrame or the path to a .csv or .feather file
+            to_path (str): The output .feather file or the output directory containing one
+                .npy file per column if file_format="npy"
+            chunksize (int): Number of rows transformed at once
+            file_format (str): Either "feather" or "npy"
+            read_csv_kwargs (dict, None): Arguments passed to pd.read_csv() if X is a csv file
+
+        Returns:
+            TransformSummary: The summary of the transformed data
+        """
+        if isinstance(X, pd.DataFrame):
+            chunks = (X.iloc[i:i + chunksize] for i in range(0, len(X), chunksize))
+        else:
+            chunks = tools.read_chunks(X, chunksize, **(read_csv_kwargs or {}))
+
+        if file_format == "feather":
+            writer = _FeatherWriter(to_path)
+        elif file_format == "npy":
+            writer = _NpyWriter(to_path)
+        else:
+            raise Exception("Unknown file format: {}".format(file_format))
+
+        summary = TransformSummary()
+        try:
+            for chunk in chunks:
+                df = self._transform(chunk)
+                for col in df.columns:
+                    if is_float_dtype(df[col]):
+                        df[col] = df[col].astype(np.float32)
+                summary.update(df)
+                self._check_transformed(df, summary)
+                writer.write(df)
+        finally:
+            writer.close()
+        summary.print()
+        print("---------- Preprocessing done -----------")
+        return summary
+
+
+class TransformSummary:
+    def __init__(self):
+        """
+        Summary statistics of transformed DataFrames accumulated
+        chunk by chunk: number of rows, dtypes and NaN counts of each column.
+        """
+        self.n_rows = 0
+        self.dtypes = None
+        self.nan_counts = None
+
+    def update(self, df):
+        """
+        Accumulate the statistics of a new chunk
+        Args:
+            df (pd.DataFrame): A transformed chunk
+        """
+        nan_counts = df.isnull().sum()
+        if self.nan_counts is None:
+            self.nan_counts = nan_counts
+            self.dtypes = df.dtypes
+        else:
+            self.nan_counts = self.nan_counts + nan_counts
+        self.n_rows += len(df)
+
+    @property
+    def nan_ratio(self):
+        return self.nan_counts / self.n_rows
+
+    def print(self):
+        print("------- Dataframe of len {} summary -------\n".format(len(self.dtypes)))
+        for col, nan, dtype in zip(self.dtypes.index, self.nan_ratio.values, self.dtypes.values):
+            print("Column {:<30}:\t dtype: {:<10}\t NaN ratio: {}".format(col, str(dtype), nan))
+
+
+class _FeatherWriter:
+    def __init__(self, path):
+        """
+        Write DataFrames chunks as record batches of a single Feather (Arrow IPC) file
+        """
+        self.path = path
+        self.writer = None
+        self.schema = None
+
+    def write(self, df):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = pa.ipc.new_file(self.path, self.schema)
+        else:
+            table = table.cast(self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _NpyWriter:
+    HEADER_SIZE = 128
+
+    def __init__(self, to_dir):
+        """
+        Write DataFrames chunks to one .npy file per column. The data are appended
+        to the files and the .npy headers are written once the number of rows is known.
+        """
+        self.to_dir = to_dir
+        self.files = None
+        self.dtypes = None
+        self.n_rows = 0
+        os.makedirs(to_dir, exist_ok=True)
+
+    def write(self, df):
+        if self.files is None:
+            self.dtypes = df.dtypes
+            self.files = [open(os.path.join(self.to_dir, "{}.npy".format(col)), "wb") for col in df.columns]
+            for f in self.files:
+                # Space for the header
+                f.write(b"\x00" * self.HEADER_SIZE)
+        for f, col, dtype in zip(self.files, df.columns, self.dtypes.values):
+            np.ascontiguousarray(df[col].values, dtype=dtype).tofile(f)
+        self.n_rows += len(df)
+
+    def close(self):
+        if self.files is None:
+            return
+        magic = np.lib.format.magic(1, 0)
+        header_len = self.HEADER_SIZE - len(magic) - 2
+        for f, dtype in zip(self.files, self.dtypes.values):
+            header = "{{'descr': {!r}, 'fortran_order': False, 'shape': ({},), }}".format(
+                np.lib.format.dtype_to_descr(np.dtype(dtype)), self.n_rows)
+            f.seek(0)
+            f.write(magic + struct.pack("<H", header_len) + (header.ljust(header_len - 1) + "\n").encode("latin1"))
+            f.close()
+
+
+class EncoderPlan:
+    def __init__(self, input_cols, cols, fill, categ, num_cols, scale_ops, hashing=None, onehot=None):
+        """
+        A frozen transformation plan compiled from a fitted encoder with BaseEncoder.compile().
+        It only relies on NumPy and precomputed lookup tables so single rows or micro-batches
+        are transformed in a few microseconds, typically at inference time.
+        Args:
+            input_cols (list): The columns needed in the inputs
+            cols (list): The columns of the output, in order
+            fill (dict): Column name -> (fill value, add a `_na` column)
+            categ (dict): Column name -> (output column, categories, encoded values, value of unknown categories)
+            num_cols (list): The scaled columns
+            scale_ops (list): The (operation, coefficients) applied in-place to the scaled columns,
+                see _get_scaler_ops()
+            hashing (dict, None): Column name -> (hash_space, seed) of the hashed columns
+            onehot (dict, None): Column name -> (categories, output columns) of the onehot encoded columns.
+                The output columns are the indicators of the categories followed by the one of the
+                unknown and missing values.
+        """
+        self.input_cols = input_cols
+        self.cols = cols
+        self.fill = fill
+        self.categ = categ
+        self.num_cols = num_cols
+        self.scale_ops = scale_ops
+        self.hashing = hashing or {}
+        self.onehot = onehot or {}
+        self._lookups = {col: (out_col,) + self._get_lookup(categories, values) + (default,)
+                         for col, (out_col, categories, values, default) in categ.items()}
+        # The onehot columns are looked up as the offsets of their indicators
+        self._onehot_lookups = {col: (out_cols,) + self._get_lookup(categories, np.arange(len(categories))) +
+                                (len(categories),) for col, (categories, out_cols) in self.onehot.items()}
+
+    @staticmethod
+    def _get_lookup(categories, values):
+        lookup = dict(zip(categories.tolist(), values.tolist()))
+        sorted_lookup = None
+        if categories.dtype.kind in "biuf":
+            sorter = np.argsort(categories, kind="stable")
+            sorted_lookup = (categories[sorter], values[sorter])
+        return lookup, sorted_lookup
+
+    def __repr__(self):
+        return "EncoderPlan(input_cols={}, cols={})".format(self.input_cols, self.cols)
+
+    def _get_columns(self, X):
+        if isinstance(X, pd.DataFrame):
+            columns = {col: X[col].values for col in self.input_cols if col in X.columns}
+        elif isinstance(X, dict):
+            columns = {col: np.atleast_1d(np.asarray(X[col])) for col in self.input_cols if col in X}
+        else:
+            # List of records
+            columns = {col: np.asarray([r[col] for r in X]) for col in self.input_cols if col in X[0]}
+        missing_cols = [col for col in self.input_cols if col not in columns]
+        if len(missing_cols) > 0:
+            raise Exception("Columns missing from the input: {}".format(missing_cols))
+        return columns
+
+    @staticmethod
+    def _encode_categ(values, lookup, sorted_lookup, default):
+        if sorted_lookup is not None and values.dtype.kind in "biuf" and len(values) > 16:
+            categories, encoded = sorted_lookup
+            if len(categories) == 0:
+                return np.full(len(values), default, dtype=np.float64)
+            idx = np.searchsorted(categories, values).clip(max=len(categories) - 1)
+            return np.where(categories[idx] == values, encoded[idx], default)
+        return np.array([lookup.get(v, default) for v in values.tolist()], dtype=np.float64)
+
+    def transform(self, X):
+        """
+        Transform the inputs
+        Args:
+            X (pd.DataFrame, dict, list): A DataFrame, a dict of column name -> array or scalar
+                (a single record) or a list of records (dicts)
+
+        Returns:
+            np.ndarray: A float64 array of shape [n_samples, len(self.cols)] equal to
+                encoder.transform(X).values
+        """
+        columns = self._get_columns(X)
+
+        for col, (value, add_na) in self.fill.items():
+            values = np.asarray(columns[col], dtype=np.float64)
+            is_null = np.isnan(values)
+            if add_na:
+                columns[col + "_na"] = is_null
+            columns[col] = np.where(is_null, value, values)
+
+        for col, (out_col, lookup, sorted_lookup, default) in self._lookups.items():
+            columns[out_col] = self._encode_categ(columns.pop(col), lookup, sorted_lookup, default)
+
+        for col, (out_cols, lookup, sorted_lookup, default) in self._onehot_lookups.items():
+            offsets = self._encode_categ(columns.pop(col), lookup, sorted_lookup, default)
+            for i, out_col in enumerate(out_cols):
+                columns[out_col] = offsets == i
+
+        for col, (hash_space, seed) in self.hashing.items():
+            columns[col] = _hash_keys([_hash_key(col, val) for val in columns[col].tolist()], hash_space, seed)[0]
+
+        if len(self.scale_ops) > 0:
+            # Same dtype and same operations as the sklearn scalers to get the same values
+            scaled = np.column_stack([np.asarray(columns[col], dtype=np.float32) for col in self.num_cols])
+            _apply_scaler_ops(scaled, self.scale_ops)
+            for i, col in enumerate(self.num_cols):
+                columns[col] = scaled[:, i]
+
+        return np.column_stack([np.asarray(columns[col], dtype=np.float64) for col in self.cols])
+
+    def transform_record(self, record):
+        """
+        Transform a single record
+        Args:
+            record (dict): Column name -> value
+
+        Returns:
+            np.ndarray: A float64 array of shape [len(self.cols)]
+        """
+        return self.transform(record)[0]
+
+    def save(self, path):
+        """
+        Save the plan to a single .npz file made of flat arrays (category values, encoded values
+        and scaler coefficients) and of a JSON header for the columns and the fill values.
+        No pickle is involved so the file is compact and loads in milliseconds.
+        /!\ Categories must be numbers, booleans or strings
+        Args:
+            path (str): The .npz file path
+        """
+        arrays = {}
+        categ_meta = []
+        for i, (col, (out_col, categories, values, default)) in enumerate(self.categ.items()):
+            if categories.dtype == object:
+                if not all(isinstance(c, str) for c in categories):
+                    raise Exception("Categories of {} are neither numbers nor strings".format(col))
+                categories = categories.astype(str)
+            arrays["categories_{}".format(i)] = categories
+            arrays["values_{}".format(i)] = values
+            categ_meta.append([col, out_col, default])
+        onehot_meta = []
+        for i, (col, (categories, out_cols)) in enumerate(self.onehot.items()):
+            if categories.dtype == object:
+                if not all(isinstance(c, str) for c in categories):
+                    raise Exception("Categories of {} are neither numbers nor strings".format(col))
+                categories = categories.astype(str)
+            arrays["onehot_categories_{}".format(i)] = categories
+            onehot_meta.append([col, out_cols])
+        for i, (op, coefs) in enumerate(self.scale_ops):
+            arrays["scale_{}".format(i)] = coefs
+
+        meta = {"input_cols": self.input_cols, "cols": self.cols, "num_cols": self.num_cols,
+                "fill": [[col, float(value), add_na] for col, (value, add_na) in self.fill.items()],
+                "categ": categ_meta, "scale_ops": [op for op, _ in self.scale_ops],
+                "hashing": [[col, hash_space, seed] for col, (hash_space, seed) in self.hashing.items()],
+                "onehot": onehot_meta}
+        arrays["meta"] = np.array(json.dumps(meta))
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @staticmethod
+    def load(path):
+        """
+        Load a plan saved with EncoderPlan.save() or BaseEncoder.save()
+        Args:
+            path (str): The .npz file path
+
+        Returns:
+            EncoderPlan: The plan
+        """
+        with np.load(path, allow_pickle=False) as arrays:
+            meta = json.loads(str(arrays["meta"]))
+            fill = {col: (value, add_na) for col, value, add_na in meta["fill"]}
+            categ = {col: (out_col, arrays["categories_{}".format(i)], arrays["values_{}".format(i)], default)
+                     for i, (col, out_col, default) in enumerate(meta["categ"])}
+            scale_ops = [(op, arrays["scale_{}".format(i)]) for i, op in enumerate(meta["scale_ops"])]
+            onehot = {col: (arrays["onehot_categories_{}".format(i)], out_cols)
+                      for i, (col, out_cols) in enumerate(meta.get("onehot", []))}
+        hashing = {col: (hash_space, seed) for col, hash_space, seed in meta["hashing"]}
+        return EncoderPlan(meta["input_cols"], meta["cols"], fill, categ, meta["num_cols"], scale_ops, hashing,
+                           onehot)
+
 
 class TreeEncoder(BaseEncoder):
-    def __init__(self, numeric_vars, categorical_vars, fix_missing=True, numeric_scaler=None):
+    def __init__(self, numeric_vars, categorical_vars, fix_missing=True, numeric_scaler=None, n_jobs=1,
+                 use_processes=False, keep_stats=False):
         """
             An encoder to encode data from structured (tabular) data
             used for tree based models (RandomForests, GBTs) as well
@@ -161,49 +1311,69 @@ class TreeEncoder(BaseEncoder):
             numeric_scaler (None, Scaler): None or a scaler from sklearn.preprocessing.data for scaling numeric features
                 All features types will be encoded as float32.
                 An sklearn StandardScaler() will fit most common cases.
-                For a more robust scaling with outliers take a look at RankGauss:
+                For a more robust scaling with outliers take a look at RankGauss (RankGaussScaler):
                     https://www.kaggle.com/c/porto-seguro-safe-driver-prediction/discussion/44629
                 and rankdata:
                     https://docs.scipy.org/doc/scipy-0.16.0/reference/generated/scipy.stats.rankdata.html
 
             Reference -> http://scikit-learn.org/stable/auto_examples/preprocessing/plot_all_scaling.html
+            n_jobs (int): Number of threads/processes used to fit and transform the columns in parallel,
+                -1 to use all the CPUs. The result is the same as with n_jobs=1.
+            use_processes (bool): True to use a pool of processes instead of a pool of threads
+            keep_stats (bool): True to keep the statistics of the fit() data so partial_fit() extends
+                the fitted encoder. Computing them makes fit() about 3 times slower.
         """
-        super().__init__(numeric_vars, categorical_vars, fix_missing, numeric_scaler)
+        super().__init__(numeric_vars, categorical_vars, fix_missing, numeric_scaler, n_jobs, use_processes,
+                         keep_stats)
 
     def _perform_na_fit(self, df, y):
-        missing = {}
         all_feat = self.categorical_vars + self.numeric_vars
-        for feat in all_feat:
-            if is_numeric_dtype(df[feat]):
-                if pd.isnull(df[feat]).sum():
-                    median = df[feat].median()
-                    missing[feat] = median
-        self.tfs_list["missing"] = missing
+        medians = self._map_columns(_get_median, [df[feat] for feat in all_feat])
+        self.tfs_list["missing"] = {feat: median for feat, median in zip(all_feat, medians) if median is not None}
 
     def _perform_na_transform(self, df):
-        for col, median in self.tfs_list["missing"].items():
-            df[col + '_na'] = df[col].isnull()
-            df[col].fillna(median, inplace=True)
+        missing = self.tfs_list["missing"]
+        results = self._map_columns(_fill_missing, [df[col] for col in missing], missing.values())
+        for col, (is_null, filled) in zip(missing, results):
+            df[col + '_na'] = is_null
+            df[col] = filled
         return df
 
     def _perform_categ_fit(self, df, y):
-        categ_cols = {}
-        for col in self.categorical_vars:
-            if col in df.columns:
-                categs = pd.factorize(df[col], na_sentinel=0, order=True)[1]
-                categ_cols[col] = categs
-        self.tfs_list["categ_cols"] = categ_cols
+        cols = [col for col in self.categorical_vars if col in df.columns]
+        categs = self._map_columns(_factorize_categories, [df[col] for col in cols])
+        self.tfs_list["categ_cols"] = dict(zip(cols, categs))
 
     def _perform_categ_transform(self, df):
-        for col, vals in self.tfs_list["categ_cols"].items():
-            # "n/a" category will be encoded as 0
-            df[col] = df[col].astype(pd.api.types.CategoricalDtype(categories=vals, ordered=True)).cat.codes + 1
+        categ_cols = self.tfs_list["categ_cols"]
+        codes = self._map_columns(_to_codes, [df[col] for col in categ_cols], categ_cols.values())
+        for col, col_codes in zip(categ_cols, codes):
+            df[col] = col_codes
         return df
 
+    def _stats_na_fit(self, stats):
+        all_feat = self.categorical_vars + self.numeric_vars
+        col_stats = [(feat, stats.columns[feat]) for feat in all_feat if feat in stats.columns]
+        self.tfs_list["missing"] = {feat: s.sketch.quantile(0.5) for feat, s in col_stats
+                                    if s.is_numeric and s.n_missing > 0}
+
+    def _stats_categ_fit(self, stats):
+        missing = self.tfs_list["missing"] if self.fix_missing else {}
+        self.tfs_list["categ_cols"] = {col: stats.columns[col].get_categories(missing.get(col))[0]
+                                       for col in self.categorical_vars if col in stats.columns}
+
+    def _compile_fill(self):
+        return {col: (median, True) for col, median in self.tfs_list["missing"].items()}
+
+    def _compile_categ(self):
+        return {col: (col, np.asarray(categories), np.arange(1, len(categories) + 1, dtype=np.float64), 0.)
+                for col, categories in self.tfs_list["categ_cols"].items()}
+
 
 class LinearEncoder(BaseEncoder):
     def __init__(self, numeric_vars, categorical_vars, fix_missing, numeric_scaler=None,
-                 categ_enc_method="target"):
+                 categ_enc_method="target", target_folds=None, target_smoothing=0., hash_space=25, hash_seed=0,
+                 hash_signed=False, n_jobs=1, use_processes=False, keep_stats=False):
         """
             An encoder used for linear based models (Linear/Logistic regression) as well
             as deep neural networks without embeddings.
@@ -215,112 +1385,222 @@ class LinearEncoder(BaseEncoder):
             numeric_scaler (None, Scaler): None or a scaler from sklearn.preprocessing.data for scaling numeric features
                 All features types will be encoded as float32.
                 An sklearn StandardScaler() will fit most common cases.
-                For a more robust scaling with outliers take a look at RankGauss:
+                For a more robust scaling with outliers take a look at RankGauss (RankGaussScaler):
                     https://www.kaggle.com/c/porto-seguro-safe-driver-prediction/discussion/44629
                 and rankdata:
                     https://docs.scipy.org/doc/scipy-0.16.0/reference/generated/scipy.stats.rankdata.html
 
             Reference -> http://scikit-learn.org/stable/auto_examples/preprocessing/plot_all_scaling.html
             categ_enc_method (str, None): One of the following methods can be used:
-                - "hashing": Better known as the "hashing trick"
+                - "hashing": Better known as the "hashing trick". Each value is replaced by its bucket
+                    in [0, hash_space), see also transform_sparse()
                 - "target": Also known as Mean encoding/Target encoding/Likelihood encoding.
-                    The implementation is based on the Expanding mean scheme
-                - "onehot": Onehot encoding.
-                    Consider using one_hot_encode_sparse() instead to get a sparse matrix with lower
+                    transform() uses the per category means of the training set while fit_transform()
+                    encodes the training rows with out-of-fold means, see target_folds.
+                - "onehot": Onehot encoding. Each column is replaced by the indicators `col_1`...`col_k` of
+                    its categories (in order of appearance) and `col_-1` for unknown and missing values.
+                    Consider using SparseOneHotEncoder instead to get a sparse matrix with lower
                     memory footprint if your categorical variable have high cardinality.
                 - None: No encoding on categorical variables will be used
+            target_folds (int, None): Used by fit_transform() with target encoding. The training rows
+                are encoded with the means of the K other folds if target_folds=K or with the means
+                of the previous rows of the same category (expanding mean scheme) if None.
+            target_smoothing (float): Weight of the global mean in the category means:
+                (sum + target_smoothing * global_mean) / (count + target_smoothing)
+            hash_space (int): Number of buckets of the hashing trick
+            hash_seed (int): Seed of the MurmurHash3 hash function. The buckets only depend on the
+                seed and the values so they are the same in the training and the serving processes.
+            hash_signed (bool): If True transform_sparse() sets the entries of the hashed values to the
+                sign of their hash (+1/-1) instead of 1 so the collisions cancel out on average
+            n_jobs (int): Number of threads/processes used to fit and transform the columns in parallel,
+                -1 to use all the CPUs. The result is the same as with n_jobs=1.
+            use_processes (bool): True to use a pool of processes instead of a pool of threads
+            keep_stats (bool): True to keep the statistics of the fit() data so partial_fit() extends
+                the fitted encoder. Computing them makes fit() about 3 times slower.
         """
-        super().__init__(numeric_vars, categorical_vars, fix_missing, numeric_scaler)
+        super().__init__(numeric_vars, categorical_vars, fix_missing, numeric_scaler, n_jobs, use_processes,
+                         keep_stats)
         self.categ_enc_method = categ_enc_method.lower() if categ_enc_method is not None else categ_enc_method
-        self.hash_space = 25
+        self.target_folds = target_folds
+        self.target_smoothing = target_smoothing
+        self.hash_space = hash_space
+        self.hash_seed = hash_seed
+        self.hash_signed = hash_signed
 
     def _perform_na_fit(self, df, y):
-        missing = []
         all_feat = self.categorical_vars + self.numeric_vars
-        for feat in all_feat:
-            if is_numeric_dtype(df[feat]):
-                if pd.isnull(df[feat]).sum():
-                    missing.append(feat)
-        self.tfs_list["missing"] = missing
+        has_missing = self._map_columns(_has_missing, [df[feat] for feat in all_feat])
+        self.tfs_list["missing"] = [feat for feat, missing in zip(all_feat, has_missing) if missing]
 
     def _perform_na_transform(self, df):
-        for col in self.tfs_list["missing"]:
-            df[col].fillna(-999999, inplace=True)
+        missing = self.tfs_list["missing"]
+        filled = self._map_columns(pd.Series.fillna, [df[col] for col in missing], [-999999] * len(missing))
+        for col, col_filled in zip(missing, filled):
+            df[col] = col_filled
         return df
 
     def _perform_categ_fit(self, df, y):
         # https://github.com/scikit-learn-contrib/categorical-encoding
         # https://tech.yandex.com/catboost/doc/dg/concepts/algorithm-main-stages_cat-to-numberic-docpage/
         # https://en.wikipedia.org/wiki/Feature_hashing#Feature_vectorization_using_the_hashing_trick
+        cols = self.categorical_vars
         categ_cols = {}
-        onehot_cols = []
-        for col in self.categorical_vars:
-            categs = df[col].astype(pd.api.types.CategoricalDtype()).cat.categories
-            if self.categ_enc_method == "onehot":
-                card = df[col].nunique()
+        if self.categ_enc_method == "onehot":
+            cards = self._map_columns(pd.Series.nunique, [df[col] for col in cols])
+            for col, card in zip(cols, cards):
                 if card > 10:
                     print("Warning, cardinality of {} = {}".format(col, card))
-                onehot_cols.append(col)
-            elif self.categ_enc_method == "target":
-                if self.tfs_list["y"] is None:
-                    raise Exception("You have to pass your target variable to the fit() "
-                                    "function for target encoding")
-                # Mean/target/likelihood encoding
-                target_col_name = self.tfs_list["y"].name
-                df_enc = df.copy()
-                df_enc[target_col_name] = self.tfs_list["y"]
-                cumsum = df_enc.groupby(col)[target_col_name].cumsum() - df_enc[target_col_name]
-                cumcnt = df_enc.groupby(col)[target_col_name].cumcount()
-                means = cumsum / cumcnt
-                means.rename('mean_enc', inplace=True)
-
-                mean_enc = pd.Series(means, index=self.tfs_list["y"]).to_dict()
-                global_mean = self.tfs_list["y"].mean()
-                categ_cols[col] = {"target": (global_mean, mean_enc)}
-            elif self.categ_enc_method == "hashing":
-                str_hashs = [col + "=" + str(val) for val in categs]
-                hashs = [hash(h) % self.hash_space for h in str_hashs]
-                categ_cols[col] = {"hashing": hashs}
-        if len(onehot_cols) > 0:
-            enc = CategOneHot(cols=onehot_cols, handle_unknown='impute')
-            enc.fit(df)
-            self.tfs_list["onehot"] = enc
+            categs = self._map_columns(_factorize_categories, [df[col] for col in cols])
+            categ_cols = {col: {"onehot": pd.Index(categories)} for col, categories in zip(cols, categs)}
+        elif self.categ_enc_method == "target":
+            if y is None:
+                raise Exception("You have to pass your target variable to the fit() "
+                                "function for target encoding")
+            items = self._map_columns(_fit_target_encoding, [df[col] for col in cols], [y] * len(cols),
+                                      [self.target_smoothing] * len(cols))
+            categ_cols = dict(zip(cols, items))
+        elif self.categ_enc_method == "hashing":
+            # Hashing is stateless, only its configuration is kept
+            categ_cols = {col: {"hashing": (self.hash_space, self.hash_seed)} for col in cols}
         self.tfs_list["categ_cols"] = categ_cols
 
     def _perform_categ_transform(self, df):
-        if self.tfs_list.get("onehot") is not None:
-            enc = self.tfs_list["onehot"]
-            # TODO check to avoid collinearity
-            df = enc.transform(df)
-
         if self.categ_enc_method is None:
             print("Warning, no encoding set for features {}".format(self.tfs_list["categ_cols"].keys()))
             return df
-        for col, item in self.tfs_list["categ_cols"].items():
+        categ_cols = self.tfs_list["categ_cols"]
+        results = self._map_columns(_transform_linear_categ, [df[col] for col in categ_cols], categ_cols.values())
+        for (col, item), res in zip(categ_cols.items(), results):
             method = next(iter(item.keys()))
             if method == "target":
-                # BE CAREFUL of the following points:
-                # • Local experiments:
-                #   ‒ Estimate encodings on X_train
-                #   ‒ Map them to X_train and X_val
-                #   ‒ Regularize on X_train
-                #   ‒ Validate the model on X_train / X_val split
-                # • Submission:
-                #   ‒ Estimate encodings on whole Train data
-                #   ‒ Map them to Train and Test
-                #   ‒ Regularize on Train
-                #   ‒ Fit on Train
-                global_mean, mean_enc = list(item.values())[0]
-                df[col + "_mean_target"] = df[col].map(mean_enc)
-                df[col + "_mean_target"] = df[col + "_mean_target"].fillna(global_mean)
+                df[col + "_mean_target"] = res
                 df.drop(col, axis=1, inplace=True)
             elif method == "hashing":
-                categs = df[col].astype(pd.api.types.CategoricalDtype()).cat.codes
-                str_hashs = [col + "=" + str(val) for val in categs]
-                hashs = [hash(h) % self.hash_space for h in str_hashs]
-                df[col] = hashs
+                df[col] = res
+            elif method == "onehot":
+                # TODO check to avoid collinearity
+                out_cols = _onehot_columns(col, item["onehot"])
+                indicators = np.zeros((len(df), len(out_cols)), dtype=np.int64)
+                indicators[np.arange(len(df)), res] = 1
+                df = pd.concat([df.drop(col, axis=1), pd.DataFrame(indicators, columns=out_cols, index=df.index)],
+                               axis=1)
+        return df
+
+    def fit_transform(self, X, y=None, **fit_params):
+        """
+        Fit the encoder to X and transform it. With target encoding the training rows are
+        encoded with out-of-fold means (see target_folds) so their own target doesn't leak
+        into their encoding.
+        Args:
+            X (pd.DataFrame): The training DataFrame
+            y (str): Column name of the target value of X
+
+        Returns:
+            pd.DataFrame: The transformed DataFrame
+        """
+        verbose = fit_params.get("verbose", True)
+        df = self._fit(X, y, out_of_fold=True)
+        self._print_transform(X, verbose)
+        return self._summarize(self._scale(df), verbose)
+
+    def _perform_categ_fit_transform(self, df, y, out_of_fold):
+        if not out_of_fold or self.categ_enc_method != "target":
+            return super()._perform_categ_fit_transform(df, y, out_of_fold)
+        if y is None:
+            raise Exception("You have to pass your target variable to the fit() "
+                            "function for target encoding")
+        # The out-of-fold means are computed from the codes of the fit, without in-sample encoding
+        cols = self.categorical_vars
+        results = self._map_columns(_fit_target_out_of_fold, [df[col] for col in cols], [y] * len(cols),
+                                    [self.target_smoothing] * len(cols), [self.target_folds] * len(cols))
+        self.tfs_list["categ_cols"] = {col: item for col, (item, _) in zip(cols, results)}
+        for col, (_, col_oof) in zip(cols, results):
+            df[col + "_mean_target"] = col_oof
+            df.drop(col, axis=1, inplace=True)
         return df
 
+    def _stats_na_fit(self, stats):
+        all_feat = self.categorical_vars + self.numeric_vars
+        self.tfs_list["missing"] = [feat for feat in all_feat if feat in stats.columns and
+                                    stats.columns[feat].is_numeric and stats.columns[feat].n_missing > 0]
+
+    def _stats_categ_fit(self, stats):
+        cols = self.categorical_vars
+        missing = self.tfs_list["missing"] if self.fix_missing else []
+        categ_cols = {}
+        if self.categ_enc_method == "onehot":
+            categ_cols = {col: {"onehot": stats.columns[col].get_categories(-999999 if col in missing else None)[0]}
+                          for col in cols}
+        elif self.categ_enc_method == "target":
+            if stats.y_count == 0:
+                raise Exception("You have to pass your target variable to the partial_fit() "
+                                "function for target encoding")
+            global_mean = stats.y_sum / stats.y_count
+            for col in cols:
+                categories, sums, counts = stats.columns[col].get_categories(-999999 if col in missing else None)
+                if sums is None:
+                    raise Exception("The target variable must be passed to every partial_fit() call")
+                means = _smoothed_means(sums, counts, global_mean, self.target_smoothing)
+                categ_cols[col] = {"target": (global_mean, categories, means)}
+        elif self.categ_enc_method == "hashing":
+            categ_cols = {col: {"hashing": (self.hash_space, self.hash_seed)} for col in cols}
+        self.tfs_list["categ_cols"] = categ_cols
+
+    def _compile_fill(self):
+        return {col: (-999999, False) for col in self.tfs_list["missing"]}
+
+    def _compile_categ(self):
+        categ = {}
+        for col, item in self.tfs_list["categ_cols"].items():
+            if "target" not in item:
+                continue
+            global_mean, categories, means = item["target"]
+            categ[col] = (col + "_mean_target", np.asarray(categories), means, float(global_mean))
+        return categ
+
+    def _compile_hashing(self):
+        return {col: item["hashing"] for col, item in self.tfs_list["categ_cols"].items() if "hashing" in item}
+
+    def _compile_onehot(self):
+        return {col: (np.asarray(item["onehot"]), _onehot_columns(col, item["onehot"]))
+                for col, item in self.tfs_list["categ_cols"].items() if "onehot" in item}
+
+    def transform_sparse(self, X):
+        """
+        Same as transform() but the hashed columns are turned into one-hot entries of
+        a shared hash space (the hashing trick) and the result is a sparse matrix.
+        Args:
+            X (pd.DataFrame): The DataFrame to transform
+
+        Returns:
+            scipy.sparse.csr_matrix: A matrix of shape [n_samples, n_other_columns + hash_space].
+                The columns which are not hashed come first, in the order of transform(X).columns,
+                followed by the hash space.
+        """
+        hashed = [col for col, item in self.tfs_list["categ_cols"].items() if "hashing" in item]
+        df = self.transform(X, verbose=False)
+        others = df.drop(hashed, axis=1)
+        if len(hashed) == 0:
+            return sparse.csr_matrix(others.values)
+
+        # The buckets are computed again to get their signs, on the NA fixed columns
+        raw = X[hashed].copy()
+        if self.fix_missing:
+            raw = raw.fillna({col: -999999 for col in self.tfs_list["missing"] if col in hashed})
+        hashs = self._map_columns(_hash_column, [raw[col] for col in hashed], [self.hash_space] * len(hashed),
+                                  [self.hash_seed] * len(hashed))
+        n_rows, n_hashed = len(df), len(hashed)
+        indices = np.column_stack([buckets for buckets, _ in hashs]).ravel()
+        if self.hash_signed:
+            data = np.column_stack([signs for _, signs in hashs]).ravel()
+        else:
+            data = np.ones(n_rows * n_hashed)
+        indptr = np.arange(0, n_rows * n_hashed + 1, n_hashed)
+        hashed_block = sparse.csr_matrix((data, indices, indptr), shape=(n_rows, self.hash_space))
+        # Values of the same row falling in the same bucket are added
+        hashed_block.sum_duplicates()
+        return sparse.hstack([sparse.csr_matrix(others.values), hashed_block], format="csr")
+
 
 class SparseOneHotEncoder:
     def __init__(self, numeric_vars, categorical_vars):
@@ -328,12 +1608,78 @@ class SparseOneHotEncoder:
             One-hot encode the given categorical_vars and return a sparse matrix.
             Features neither in numeric_vars nor in categorical_vars won't be considered
             in the resulting sparse matrix.
+            The columns of the matrix are the categories of each categorical variable (in order of
+            appearance, missing and unknown values have no entry) followed by the numeric variables.
         Args:
             numeric_vars (list): The list of variables to encode as numeric values.
             categorical_vars (list): List of categorical vars to transform to onehot
         """
         self.numeric_vars = numeric_vars
         self.categorical_vars = categorical_vars
+        self.categories = {col: pd.Index([]) for col in categorical_vars}
+
+    @property
+    def n_features(self):
+        return sum(len(categs) for categs in self.categories.values()) + len(self.numeric_vars)
+
+    def get_feature_names(self):
+        """
+        Returns:
+            list: The names of the columns of the sparse matrix, "var=category" for the categories
+        """
+        names = ["{}={}".format(col, val) for col, categs in self.categories.items() for val in categs]
+        return names + list(self.numeric_vars)
+
+    def partial_fit(self, df):
+        """
+        Collect the categories of a chunk of data. The categories which were not seen in the
+        previous chunks are appended to the known ones.
+        Args:
+            df (pd.DataFrame): A chunk of data
+
+        Returns:
+            SparseOneHotEncoder: self
+        """
+        for col in self.categorical_vars:
+            uniques = pd.Index(pd.factorize(df[col])[1])
+            new = uniques[self.categories[col].get_indexer(uniques) < 0]
+            if len(new) > 0:
+                self.categories[col] = self.categories[col].append(new)
+        return self
+
+    def fit(self, df):
+        self.categories = {col: pd.Index([]) for col in self.categorical_vars}
+        return self.partial_fit(df)
+
+    def transform(self, df):
+        """
+        Build the sparse matrix of a DataFrame directly from the category codes of each variable
+        Args:
+            df (pd.DataFrame): The DataFrame to transform
+
+        Returns:
+            scipy.sparse.csr_matrix: A matrix of shape [n_samples, n_features]
+        """
+        n_rows = len(df)
+        indices, data = [], []
+        offset = 0
+        for col in self.categorical_vars:
+            categs = self.categories[col]
+            codes = categs.get_indexer(df[col])
+            # Missing and unknown values (-1) are masked below
+            indices.append(np.where(codes >= 0, codes + offset, -1))
+            data.append(np.ones(n_rows))
+            offset += len(categs)
+        for i, col in enumerate(self.numeric_vars):
+            indices.append(np.full(n_rows, offset + i))
+            data.append(df[col].values.astype(np.float64))
+
+        indices = np.column_stack(indices) if len(indices) > 0 else np.empty((n_rows, 0), dtype=np.int64)
+        data = np.column_stack(data) if len(data) > 0 else np.empty((n_rows, 0))
+        mask = (indices >= 0) & (data != 0)
+        # The row-major order of the masked entries gives the CSR layout
+        indptr = np.r_[0, np.cumsum(mask.sum(axis=1))]
+        return sparse.csr_matrix((data[mask], indices[mask], indptr), shape=(n_rows, self.n_features))
 
     def fit_transform(self, df_list):
         """
@@ -347,28 +1693,12 @@ class SparseOneHotEncoder:
         Returns:
             list: List of sparse matrix in the same order as the passed df
         """
-        # Concatenate
-        df = pd.concat(df_list)
-        df = df[self.numeric_vars + self.categorical_vars]
-        lenc = LabelEncoder()
-        inds = [0] + [df.shape[0] for df in df_list]
-        categs_inds = []
-
-        for categ_var in self.categorical_vars:
-            categs_inds.append(df.columns.get_loc(categ_var))
-            df[categ_var] = lenc.fit_transform(df[categ_var].values) + 1
-            if len(lenc.classes_) > 10:
-                print("Warning, cardinality of {} = {}".format(categ_var, len(lenc.classes_)))
-
-        # Create an internal sparse matrix
-        enc = OneHotEncoder(categorical_features=categs_inds)
-        enc.fit(df.values)
-        # Separate back the DataFrames with the right columns
-        all_df = [df.iloc[inds[i]:ind + inds[i]] for i, ind in enumerate(inds[1:])]
-
-        # Turn them into sparse matrix
-        res = []
-        for sep_df in all_df:
-            # TODO check to avoid collinearity
-            res.append(enc.transform(sep_df.values))
-        return res
+        self.categories = {col: pd.Index([]) for col in self.categorical_vars}
+        for df in df_list:
+            self.partial_fit(df)
+        for col, categs in self.categories.items():
+            if len(categs) > 10:
+                print("Warning, cardinality of {} = {}".format(col, len(categs)))
+
+        # TODO check to avoid collinearity
+        return [self.transform(df) for df in df_list]
@@ -1,6 +1,7 @@
 import numpy as np
 from tqdm import tqdm
 import pandas as pd
+import pyarrow as pa
 
 
 def count_missing(df_list):
@@ -45,3 +46,25 @@ def get_duplicated_columns(df, drop_duplicates=False):
         df.drop(dup_cols.keys(), axis=1, inplace=True)
 
     return dup_cols
+
+
+def read_chunks(path, chunksize, **read_csv_kwargs):
+    """
+    Read a .csv or .feather file chunk by chunk
+    Args:
+        path (str): The path to a .csv or .feather (Arrow IPC) file
+        chunksize (int): The maximum number of rows per chunk
+        **read_csv_kwargs (dict): Arguments passed to pd.read_csv()
+
+    Returns:
+        generator: A generator of DataFrames
+    """
+    if str(path).endswith(".csv"):
+        yield from pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs)
+    else:
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                for start in range(0, batch.num_rows, chunksize):
+                    yield batch.slice(start, chunksize).to_pandas()
@@ -0,0 +1,196 @@
+"""
+PySpark integration of the tabular encoders from torchlite.pandas.tabular_encoder.
+The encoders are fitted from Spark aggregations (no row is collected) and
+their compiled EncoderPlan is broadcast and applied to the Arrow batches of the
+Spark DataFrame with mapInPandas.
+E.g:
+    encoder = TreeEncoder(numeric_vars, categorical_vars, numeric_scaler=StandardScaler())
+    spark_encoder.fit(encoder, sdf, y="Sales")
+    encoded_sdf = spark_encoder.transform(sdf, encoder, keep_cols=["Id"])
+Works the same on a cluster or with a local session: SparkSession.builder.master("local[*]")
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+from pyspark.sql import functions as F
+from pyspark.sql import types as T
+import torchlite.pandas.tabular_encoder as tabular_encoder
+
+_NUMERIC_TYPES = (T.ByteType, T.ShortType, T.IntegerType, T.LongType, T.FloatType, T.DoubleType, T.DecimalType)
+
+
+def _get_template(schema, feats):
+    """
+    Returns an empty pandas DataFrame with the dtypes the features have once converted to pandas
+    """
+    columns = {}
+    for feat in feats:
+        data_type = schema[feat].dataType
+        if isinstance(data_type, T.BooleanType):
+            dtype = np.bool_
+        elif isinstance(data_type, _NUMERIC_TYPES):
+            dtype = np.float64
+        else:
+            dtype = object
+        columns[feat] = pd.Series([], dtype=dtype)
+    return pd.DataFrame(columns)
+
+
+def _build_column_stats(is_numeric, n_rows, count, moments=None, quantiles=None, categories=None,
+                        target_groups=None):
+    """
+    Build the ColumnStats of a column from the results of the Spark aggregations
+    Args:
+        is_numeric (bool): True if the column is numeric
+        n_rows (int): The number of rows of the DataFrame
+        count (int): The number of non missing values
+        moments (tuple, None): (mean, population variance, min, max) of the float32 values of a numeric column
+        quantiles (list, None): Equally spaced quantiles (from 0 to 1) of a numeric column
+        categories (list, None): The distinct non missing values of a categorical column
+        target_groups (list, None): (value, target sum, target count) per value of a categorical column,
+            the missing values having the value None. Replaces categories when the target is used.
+
+    Returns:
+        ColumnStats: The column statistics
+    """
+    stats = tabular_encoder.ColumnStats(is_numeric)
+    stats.n_missing = n_rows - count
+    if is_numeric and count > 0:
+        mean, var, min_value, max_value = moments
+        stats.moments = (count, mean, var * count, min_value, max_value)
+        if quantiles:
+            stats.sketch.update(quantiles, np.full(len(quantiles), count / len(quantiles)))
+
+    if target_groups is not None:
+        groups = sorted((g for g in target_groups if g[0] is not None), key=lambda g: g[0])
+        missing_groups = [g for g in target_groups if g[0] is None]
+        categories = [value for value, _, _ in groups]
+        stats.y_sums = np.array([y_sum or 0. for _, y_sum, _ in groups], dtype=np.float64)
+        stats.y_counts = np.array([y_count for _, _, y_count in groups], dtype=np.float64)
+        if len(missing_groups) > 0:
+            stats.y_nan_sum = missing_groups[0][1] or 0.
+            stats.y_nan_count = missing_groups[0][2]
+    if categories is not None:
+        # Spark rows have no order: the categories are sorted instead of being in order of appearance
+        stats.categories = pd.Index(sorted(categories))
+        if stats.n_missing > 0:
+            stats.first_nan_pos = len(stats.categories)
+    return stats
+
+
+def get_stats(encoder, sdf, y=None, n_quantiles=1001, relative_error=1e-4):
+    """
+    Compute the EncoderStats of a Spark DataFrame with Spark aggregations. They can be passed to
+    encoder.fit_from_stats() and give (nearly) the same encoder as encoder.fit() on the pandas DataFrame:
+        - The categories are sorted instead of being in order of appearance
+        - The medians and quantiles come from DataFrame.approxQuantile()
+    Only the aggregates are collected to the driver, plus the distinct values of the categorical columns.
+    Args:
+        encoder (BaseEncoder): A TreeEncoder or LinearEncoder
+        sdf (pyspark.sql.DataFrame): The Spark DataFrame
+        y (str, None): Column name of the target value
+        n_quantiles (int): Number of quantiles computed for each numeric column
+        relative_error (float): The relative error of approxQuantile()
+
+    Returns:
+        EncoderStats: The statistics of the DataFrame
+    """
+    all_feat = encoder.categorical_vars + encoder.numeric_vars
+    feats = [feat for feat in all_feat if feat in sdf.columns]
+    template = _get_template(sdf.schema, feats)
+    numeric = [feat for feat in feats if is_numeric_dtype(template[feat])]
+
+    # NaN are missing values in pandas, turn them to null
+    columns = []
+    for feat in feats:
+        col = F.col(feat)
+        is_missing = col.isNull()
+        if isinstance(sdf.schema[feat].dataType, (T.FloatType, T.DoubleType)):
+            is_missing = is_missing | F.isnan(col)
+        columns.append(F.when(~is_missing, col.cast("double") if feat in numeric else col).alias(feat))
+    if y is not None:
+        columns.append(F.col(y).cast("double").alias(y))
+    sdf = sdf.select(*columns)
+
+    aggs = [F.count(F.lit(1)).alias("n_rows")]
+    for i, feat in enumerate(feats):
+        aggs.append(F.count(feat).alias("count_{}".format(i)))
+        if feat in numeric:
+            # The scalers are fitted on float32 values
+            col = F.col(feat).cast("float").cast("double")
+            aggs += [F.avg(col).alias("mean_{}".format(i)), F.var_pop(col).alias("var_{}".format(i)),
+                     F.min(col).alias("min_{}".format(i)), F.max(col).alias("max_{}".format(i))]
+    if y is not None:
+        aggs += [F.sum(y).alias("y_sum"), F.count(y).alias("y_count")]
+    row = sdf.agg(*aggs).collect()[0]
+    n_rows = row["n_rows"]
+
+    probs = np.linspace(0, 1, n_quantiles).tolist()
+    quantiles = dict(zip(numeric, sdf.approxQuantile(numeric, probs, relative_error))) if numeric else {}
+
+    col_stats = {}
+    for i, feat in enumerate(feats):
+        kwargs = {}
+        if feat in numeric and row["count_{}".format(i)] > 0:
+            kwargs["moments"] = tuple(row["{}_{}".format(name, i)] for name in ("mean", "var", "min", "max"))
+            kwargs["quantiles"] = quantiles[feat]
+        if feat in encoder.categorical_vars:
+            if y is not None:
+                groups = sdf.groupBy(feat).agg(F.sum(y), F.count(y)).collect()
+                kwargs["target_groups"] = [tuple(g) for g in groups]
+            else:
+                kwargs["categories"] = [r[0] for r in sdf.select(feat).where(F.col(feat).isNotNull())
+                                        .distinct().collect()]
+        col_stats[feat] = _build_column_stats(feat in numeric, n_rows, row["count_{}".format(i)], **kwargs)
+
+    y_sum, y_count = (row["y_sum"] or 0., row["y_count"]) if y is not None else (0., 0)
+    return tabular_encoder.EncoderStats(col_stats, template, y_sum, y_count)
+
+
+def fit(encoder, sdf, y=None, n_quantiles=1001, relative_error=1e-4):
+    """
+    Fit a TreeEncoder/LinearEncoder on a Spark DataFrame, see get_stats()
+    Args:
+        encoder (BaseEncoder): A TreeEncoder or LinearEncoder
+        sdf (pyspark.sql.DataFrame): The Spark DataFrame
+        y (str, None): Column name of the target value
+        n_quantiles (int): Number of quantiles computed for each numeric column
+        relative_error (float): The relative error of approxQuantile()
+
+    Returns:
+        BaseEncoder: The fitted encoder
+    """
+    encoder.stats = None
+    return encoder.fit_from_stats(get_stats(encoder, sdf, y, n_quantiles, relative_error))
+
+
+def _transform_batches(batches, plan, keep_cols):
+    for df in batches:
+        encoded = pd.DataFrame(plan.transform(df), columns=plan.cols, index=df.index)
+        yield pd.concat([df[keep_cols], encoded], axis=1)
+
+
+def transform(sdf, encoder, keep_cols=None):
+    """
+    Transform a Spark DataFrame with a fitted encoder. The encoder is compiled into an
+    EncoderPlan which is broadcast to the executors and applied to the Arrow batches
+    of the DataFrame with mapInPandas.
+    Args:
+        sdf (pyspark.sql.DataFrame): The Spark DataFrame
+        encoder (BaseEncoder, EncoderPlan): A fitted encoder or its compiled plan
+        keep_cols (list, None): Columns of sdf passed through, typically ids or the target
+
+    Returns:
+        pyspark.sql.DataFrame: The keep_cols followed by the encoded columns (as doubles)
+    """
+    plan = encoder.compile() if isinstance(encoder, tabular_encoder.BaseEncoder) else encoder
+    keep_cols = keep_cols or []
+    broadcast_plan = sdf.sparkSession.sparkContext.broadcast(plan)
+    schema = T.StructType([sdf.schema[col] for col in keep_cols] +
+                          [T.StructField(col, T.DoubleType()) for col in plan.cols])
+
+    def transform_batches(batches):
+        return _transform_batches(batches, broadcast_plan.value, keep_cols)
+
+    input_cols = keep_cols + [col for col in plan.input_cols if col not in keep_cols]
+    return sdf.select(*input_cols).mapInPandas(transform_batches, schema)
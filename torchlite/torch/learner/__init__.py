@@ -13,14 +13,18 @@ from torchlite.torch.learner.cores import BaseCore
 
 
 class Learner:
-    def __init__(self, learner_core: BaseCore, use_cuda=True):
+    def __init__(self, learner_core: BaseCore, use_cuda=True, resource_plan=None):
         """
         The learner class used to train deep neural network
         Args:
             learner_core (BaseCore): The learner core
             use_cuda (bool): If True moves the model onto the GPU
+            resource_plan (ResourcePlan, None): If set, the number of torch threads (and CPU affinity)
+                of the plan are applied before training and predicting.
+                See torchlite.torch.tools.resources
         """
         self.learner_core = learner_core
+        self.resource_plan = resource_plan
         self.epoch_id = 1
         self.device = torch.device("cpu")
         if use_cuda:
@@ -97,7 +101,7 @@ class Learner:
         self.learner_core.on_eval_mode()
 
         # Run the validation pass
-        if valid_loader:
+        if valid_loader is not None:
             step = "validation"
             logs = {"step": step, "epoch_id": self.epoch_id}
             self.learner_core.on_new_epoch()
@@ -124,6 +128,8 @@ class Learner:
             callbacks (list, None): List of train callbacks functions
         """
         train_start_time = datetime.now()
+        if self.resource_plan is not None:
+            self.resource_plan.apply()
         self.learner_core.to_device(self.device)
 
         if not callbacks:
@@ -158,6 +164,8 @@ class Learner:
             shapes and flattening over all the batch won't work.
         """
         test_start_time = datetime.now()
+        if self.resource_plan is not None:
+            self.resource_plan.apply()
         # Switch to evaluation mode
         self.learner_core.on_eval_mode()
         self.learner_core.to_device(self.device)
@@ -80,6 +80,48 @@ class TabularModel(nn.Module):
         return x
 
 
+class SparseLinear(nn.Module):
+    def __init__(self, n_features, output_size=1):
+        """
+        A linear (or logistic with a sigmoid criterion) model over torch.sparse_csr inputs.
+        Only the weights of the non zero features of a batch are involved in the product.
+        Args:
+            n_features (int): Number of features of the sparse inputs
+            output_size (int): Number of outputs
+        """
+        super().__init__()
+        self.weight = nn.Parameter(torch.zeros(n_features, output_size))
+        self.bias = nn.Parameter(torch.zeros(output_size))
+
+    def forward(self, x):
+        return torch.sparse.mm(x, self.weight) + self.bias
+
+
+class FactorizationMachine(nn.Module):
+    def __init__(self, n_features, n_factors=8, output_size=1):
+        """
+        A second order factorization machine over torch.sparse_csr inputs:
+            y = b + <w, x> + sum_{i<j} <v_i, v_j> x_i x_j
+        The pairwise interactions are computed in O(n_factors * nnz) with
+        0.5 * sum_f ((x V)_f^2 - (x^2 V^2)_f)
+        Reference -> https://www.csie.ntu.edu.tw/~b97053/paper/Rendle2010FM.pdf
+        Args:
+            n_features (int): Number of features of the sparse inputs
+            n_factors (int): Size of the latent vectors of the features
+            output_size (int): Number of outputs
+        """
+        super().__init__()
+        self.linear = SparseLinear(n_features, output_size)
+        self.factors = nn.Parameter(torch.randn(n_features, n_factors) * 0.01)
+
+    def forward(self, x):
+        x_squared = torch.sparse_csr_tensor(x.crow_indices(), x.col_indices(), x.values() ** 2, size=x.shape)
+        sum_squared = torch.sparse.mm(x, self.factors) ** 2
+        squared_sum = torch.sparse.mm(x_squared, self.factors ** 2)
+        interactions = 0.5 * (sum_squared - squared_sum).sum(1, keepdim=True)
+        return self.linear(x) + interactions
+
+
 class Flatten(nn.Module):
     def __init__(self):
         super().__init__()
@@ -3,8 +3,8 @@
     in them. The serve as the "default way to go" when you train for a particular dataset
     but don't want to spend time creating the architecture of a model.
 """
-import os
 import numpy as np
+import torch
 import torch.nn as nn
 from typing import Union
 import torchvision
@@ -12,15 +12,44 @@ from torch.utils.data import Dataset, DataLoader
 
 import torchlite.data.files as tfiles
 from torchlite.data.datasets import ColumnarDataset, ImageClassificationDataset
+from torchlite.data.loaders import ThreadedDataLoader, ColumnarLoader
 from torchlite.torch.models import TabularModel, FinetunedConvModel
-from torchlite.torch.tools import tensor_tools
+from torchlite.torch.tools import tensor_tools, resources
 
 
 class BaseLoader:
-    def __init__(self, train_ds, val_ds, batch_size, shuffle, test_ds=None, num_workers=os.cpu_count()):
-        self.train_dl = DataLoader(train_ds, batch_size, shuffle=shuffle, num_workers=num_workers)
-        self.val_dl = DataLoader(val_ds, batch_size, shuffle=False, num_workers=num_workers) if val_ds else None
-        self.test_dl = DataLoader(test_ds, batch_size, shuffle=False, num_workers=num_workers) if test_ds else None
+    def __init__(self, train_ds, val_ds, batch_size, shuffle, test_ds=None, num_workers=None,
+                 num_threads=None, resource_plan=None):
+        """
+        Creates the train/val/test loaders
+        Args:
+            train_ds (Dataset): The train dataset
+            val_ds (Dataset, None): The validation dataset
+            batch_size (int): The batch size
+            shuffle (bool): If True shuffle the training set
+            test_ds (Dataset, None): The test dataset
+            num_workers (int, None): Number of worker processes per loader or None to split
+                the CPUs between the workers and the torch threads with the resource_plan
+            num_threads (int, None): If set, the loaders are ThreadedDataLoader using num_threads
+                threads instead of num_workers processes
+            resource_plan (ResourcePlan, None): The CPUs split between the loaders workers and the
+                torch threads or None to use resources.plan_resources(). It's ignored if num_workers is set.
+                Only the number of workers is used by the loaders, pass the plan (self.resource_plan) to
+                the Learner to apply its torch threads at fit time.
+        """
+        if num_workers is None:
+            self.resource_plan = resource_plan if resource_plan is not None else resources.plan_resources()
+        else:
+            self.resource_plan = resources.ResourcePlan(num_workers, torch.get_num_threads())
+        self.num_threads = num_threads
+        self.train_dl = self._create_loader(train_ds, batch_size, shuffle, persistent=True)
+        self.val_dl = self._create_loader(val_ds, batch_size, False, persistent=True) if val_ds else None
+        self.test_dl = self._create_loader(test_ds, batch_size, False, persistent=False) if test_ds else None
+
+    def _create_loader(self, ds, batch_size, shuffle, persistent):
+        if self.num_threads:
+            return ThreadedDataLoader(ds, batch_size, shuffle=shuffle, num_threads=self.num_threads)
+        return DataLoader(ds, batch_size, shuffle=shuffle, **self.resource_plan.loader_kwargs(persistent))
 
     @property
     def get_train_loader(self):
@@ -36,7 +65,8 @@ class BaseLoader:
 
 
 class ColumnarShortcut(BaseLoader):
-    def __init__(self, train_ds, val_ds=None, test_ds=None, batch_size=64, shuffle=True):
+    def __init__(self, train_ds, val_ds=None, test_ds=None, batch_size=64, shuffle=True, num_threads=None,
+                 resource_plan=None, whole_batches=True):
         """
         A shortcut used for structured/columnar data
         Args:
@@ -45,11 +75,30 @@ class ColumnarShortcut(BaseLoader):
             test_ds (Dataset): The test dataset
             batch_size (int): The batch size for the training
             shuffle (bool): If True shuffle the training set
+            num_threads (int, None): If set, load the data with num_threads threads instead of worker processes
+            resource_plan (ResourcePlan, None): The CPUs split between the loaders workers and the torch threads
+            whole_batches (bool): If True the ColumnarDataset are loaded with a ColumnarLoader which
+                slices whole batches at once instead of collating rows in worker processes.
+                /!\ The ColumnarLoader uses neither threads nor workers: num_threads and the workers of
+                resource_plan only apply to the other datasets. Set whole_batches=False to use them.
         """
-        super().__init__(train_ds, val_ds, batch_size, shuffle, test_ds)
+        self.whole_batches = whole_batches
+        uses_columnar_loader = whole_batches and any(isinstance(ds, ColumnarDataset)
+                                                     for ds in (train_ds, val_ds, test_ds))
+        if uses_columnar_loader and (num_threads or resource_plan is not None):
+            print("Warning: num_threads and resource_plan are ignored by the ColumnarLoader, "
+                  "pass whole_batches=False to load the ColumnarDataset with threads or workers")
+        super().__init__(train_ds, val_ds, batch_size, shuffle, test_ds, num_threads=num_threads,
+                         resource_plan=resource_plan)
+
+    def _create_loader(self, ds, batch_size, shuffle, persistent):
+        if self.whole_batches and isinstance(ds, ColumnarDataset):
+            return ColumnarLoader(ds, batch_size, shuffle=shuffle)
+        return super()._create_loader(ds, batch_size, shuffle, persistent)
 
     @classmethod
-    def from_data_frames(cls, train_df, val_df, y_field, cat_fields, batch_size, test_df=None):
+    def from_data_frames(cls, train_df, val_df, y_field, cat_fields, batch_size, test_df=None, num_threads=None,
+                         resource_plan=None, whole_batches=True):
         """
         Create a columnar shortcut from DataFrames.
         Args:
@@ -59,6 +108,10 @@ class ColumnarShortcut(BaseLoader):
             cat_fields (list): List of categorical fields
             batch_size (int): Batch size
             test_df (DataFrame, None): The test DataFrame
+            num_threads (int, None): If set, load the data with num_threads threads instead of worker processes
+            resource_plan (ResourcePlan, None): The CPUs split between the loaders workers and the torch threads
+            whole_batches (bool): If True the batches are sliced at once with a ColumnarLoader which
+                ignores num_threads and resource_plan, see ColumnarShortcut
 
         Returns:
             ColumnarShortcut: A ColumnarShortcut object
@@ -73,7 +126,8 @@ class ColumnarShortcut(BaseLoader):
         else:
             val_ds = None
         test_ds = ColumnarDataset.from_data_frame(test_df, cat_fields) if test_df is not None else None
-        return cls(train_ds, val_ds, test_ds, batch_size)
+        return cls(train_ds, val_ds, test_ds, batch_size, num_threads=num_threads, resource_plan=resource_plan,
+                   whole_batches=whole_batches)
 
     def get_stationary_model(self, card_cat_features, n_cont, output_size, emb_drop, hidden_sizes, hidden_dropouts,
                              max_embedding_size=50, y_range=None, use_bn=False):
@@ -111,7 +165,8 @@ class ColumnarShortcut(BaseLoader):
 
 
 class ImageClassifierShortcut(BaseLoader):
-    def __init__(self, train_ds, val_ds=None, test_ds=None, y_mapping=None, batch_size=64, shuffle=True):
+    def __init__(self, train_ds, val_ds=None, test_ds=None, y_mapping=None, batch_size=64, shuffle=True,
+                 num_threads=None, resource_plan=None):
         """
         A shortcut used for image data
         Args:
@@ -121,13 +176,16 @@ class ImageClassifierShortcut(BaseLoader):
             y_mapping (dict): Mapping between the labels and the indexes
             batch_size (int): The batch size for the training
             shuffle (bool): If True shuffle the training set
+            num_threads (int, None): If set, load the data with num_threads threads instead of worker processes
+            resource_plan (ResourcePlan, None): The CPUs split between the loaders workers and the torch threads
         """
         self.y_mapping = y_mapping
-        super().__init__(train_ds, val_ds, batch_size, shuffle, test_ds)
+        super().__init__(train_ds, val_ds, batch_size, shuffle, test_ds, num_threads=num_threads,
+                         resource_plan=resource_plan)
 
     @classmethod
     def from_paths(cls, train_folder: str, val_folder: Union[str, None], test_folder: Union[str, None] = None,
-                   batch_size=64, transforms=None):
+                   batch_size=64, transforms=None, num_threads=None, resource_plan=None):
         """
         Read in images and their labels given as sub-folder names
 
@@ -137,6 +195,8 @@ class ImageClassifierShortcut(BaseLoader):
             test_folder (str, None): The path to the test folder
             batch_size (int): The batch_size
             transforms (torchvision.transforms.Compose): List of transformations (for data augmentation)
+            num_threads (int, None): If set, load the data with num_threads threads instead of worker processes
+            resource_plan (ResourcePlan, None): The CPUs split between the loaders workers and the torch threads
 
         Returns:
             ImageClassifierShortcut: A ImageClassifierShortcut object
@@ -158,7 +218,8 @@ class ImageClassifierShortcut(BaseLoader):
         else:
             datasets.append(None)
 
-        return cls(datasets[0], datasets[1], datasets[2], y_mapping, batch_size)
+        return cls(datasets[0], datasets[1], datasets[2], y_mapping, batch_size, num_threads=num_threads,
+                   resource_plan=resource_plan)
 
     @property
     def get_y_mapping(self):
@@ -2,6 +2,7 @@
 This module contains callbacks used during the test phase.
 """
 from torchlite.data.datasets import ImageDataset
+from torchlite.torch.train_callbacks import get_loader_len
 from tqdm import tqdm
 
 
@@ -90,7 +91,7 @@ class TQDM(TestCallback):
         self.pbar = None
 
     def on_test_begin(self, logs=None):
-        test_loader_len = len(logs["loader"])
+        test_loader_len = get_loader_len(logs["loader"])
         self.pbar = tqdm(total=test_loader_len, desc="Classifying")
 
     def on_batch_end(self, batch, logs=None):
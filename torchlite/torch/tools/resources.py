@@ -0,0 +1,150 @@
+"""
+This module contains helpers to share the CPU cores between the data loaders
+worker processes and the torch compute threads.
+"""
+import os
+import time
+import torch
+from torch.utils.data import DataLoader
+
+
+def get_available_cpus():
+    """
+    Returns the ids of the CPUs the current process can run on
+    Returns:
+        list: A list of CPU ids
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count()))
+
+
+class ResourcePlan:
+    def __init__(self, num_workers, num_threads, cpus=None, set_affinity=False):
+        """
+        A split of the CPU cores between the loader workers and the torch intra-op threads.
+        Only one loader is iterated at a time (train, then val) so each loader gets
+        all the workers of the plan.
+        Args:
+            num_workers (int): Number of worker processes per loader
+            num_threads (int): Number of torch intra-op threads
+            cpus (list, None): The CPU ids to share or None to use all the available ones
+            set_affinity (bool): If True the main process is pinned to the first num_threads CPUs
+                and the loader workers to the remaining ones
+        """
+        self.num_workers = num_workers
+        self.num_threads = num_threads
+        self.cpus = cpus if cpus is not None else get_available_cpus()
+        self.set_affinity = set_affinity and hasattr(os, "sched_setaffinity")
+
+    def __repr__(self):
+        return "ResourcePlan(num_workers={}, num_threads={}, set_affinity={})".format(
+            self.num_workers, self.num_threads, self.set_affinity)
+
+    @property
+    def compute_cpus(self):
+        return self.cpus[:self.num_threads]
+
+    @property
+    def worker_cpus(self):
+        return self.cpus[self.num_threads:] or self.cpus
+
+    def apply(self):
+        """
+        Set the number of torch threads (and the CPU affinity) of the current process
+        """
+        torch.set_num_threads(self.num_threads)
+        if self.set_affinity:
+            os.sched_setaffinity(0, self.compute_cpus)
+
+    def worker_init_fn(self, worker_id):
+        # The workers only load data, they don't need intra-op parallelism
+        torch.set_num_threads(1)
+        if self.set_affinity:
+            os.sched_setaffinity(0, self.worker_cpus)
+
+    def loader_kwargs(self, persistent=True):
+        """
+        Returns the arguments to pass to a DataLoader to follow this plan
+        Args:
+            persistent (bool): If True the workers are kept alive between epochs
+                instead of being recreated for every epoch
+
+        Returns:
+            dict: The DataLoader keyword arguments
+        """
+        kwargs = {"num_workers": self.num_workers}
+        if self.num_workers > 0:
+            kwargs.update({"persistent_workers": persistent, "worker_init_fn": self.worker_init_fn})
+        return kwargs
+
+
+def plan_resources(compute_ratio=0.5, cpus=None, set_affinity=False):
+    """
+    Split the available CPUs between the loader workers and the torch threads.
+    Args:
+        compute_ratio (float): Ratio of the CPUs given to the torch threads. When training
+            on the GPU you may want to lower it to give more CPUs to the loaders.
+        cpus (list, None): The CPU ids to share or None to use all the available ones
+        set_affinity (bool): If True pins the torch threads and the workers to their own CPUs
+
+    Returns:
+        ResourcePlan: The resource plan
+    """
+    cpus = cpus if cpus is not None else get_available_cpus()
+    n_cpus = len(cpus)
+    num_threads = min(n_cpus, max(1, int(round(n_cpus * compute_ratio))))
+    num_workers = n_cpus - num_threads
+    return ResourcePlan(num_workers, num_threads, cpus, set_affinity)
+
+
+def autotune(dataset, batch_size, shuffle=True, compute_ratios=(0.25, 0.5, 0.75), step_fn=None,
+             n_batches=10, cpus=None, set_affinity=False):
+    """
+    Measure the throughput (samples/sec) of the first batches of the dataset for
+    different resource plans and return the fastest one. The first batch is not measured
+    as it includes the workers startup.
+    Args:
+        dataset (Dataset): The dataset to load
+        batch_size (int): The batch size
+        shuffle (bool): If True the samples are shuffled as they would be during training
+        compute_ratios (tuple): The compute ratios to try, see plan_resources()
+        step_fn (callable, None): A function called on each batch (typically the forward/backward
+            pass of the model) so the torch threads are measured as well
+        n_batches (int): Number of batches measured per plan
+        cpus (list, None): The CPU ids to share or None to use all the available ones
+        set_affinity (bool): If True pins the torch threads and the workers to their own CPUs
+
+    Returns:
+        ResourcePlan: The fastest resource plan (already applied)
+    """
+    plans = {}
+    for ratio in compute_ratios:
+        plan = plan_resources(ratio, cpus, set_affinity)
+        plans[(plan.num_workers, plan.num_threads)] = plan
+
+    best_plan, best_throughput = None, -1
+    for plan in plans.values():
+        plan.apply()
+        loader = DataLoader(dataset, batch_size, shuffle=shuffle, **plan.loader_kwargs(persistent=False))
+        samples = 0
+        start_time = None
+        for i, batch in enumerate(loader):
+            if step_fn is not None:
+                step_fn(batch)
+            if i == 0:
+                start_time = time.perf_counter()
+                continue
+            samples += len(batch[0]) if isinstance(batch, (list, tuple)) else len(batch)
+            if i >= n_batches:
+                break
+        del loader
+        elapsed = time.perf_counter() - start_time if start_time is not None else 0
+        throughput = samples / elapsed if elapsed > 0 else 0
+        print("{}: {:.1f} samples/sec".format(plan, throughput))
+        if throughput > best_throughput:
+            best_plan, best_throughput = plan, throughput
+
+    best_plan.apply()
+    print("Selected {}".format(best_plan))
+    return best_plan
@@ -10,6 +10,17 @@ from collections import OrderedDict
 from tensorboardX import SummaryWriter
 
 
+def get_loader_len(loader):
+    """
+    Returns the number of batches of a loader or None if it's unknown
+    (e.g: loaders of IterableDataset)
+    """
+    try:
+        return len(loader)
+    except TypeError:
+        return None
+
+
 class TrainCallback:
     def on_epoch_begin(self, epoch, logs=None):
         pass
@@ -178,8 +189,8 @@ class TQDM(TrainCallback):
 
     def on_train_begin(self, logs=None):
         self.total_epochs = logs["total_epochs"]
-        self.train_loader_len = len(logs["train_loader"])
-        self.val_loader_len = len(logs["val_loader"]) if logs["val_loader"] else None
+        self.train_loader_len = get_loader_len(logs["train_loader"])
+        self.val_loader_len = get_loader_len(logs["val_loader"]) if logs["val_loader"] is not None else None
 
 
 class ReduceLROnPlateau(TrainCallback):